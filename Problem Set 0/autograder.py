@@ -1,27 +1,240 @@
+# The same autograder is used by all the problem sets, the copies in the problem set folders must stay identical
 import traceback
 import threading, _thread, ctypes
 import time, json, os, fnmatch
-import argparse
-from typing import Any, Callable, Dict, List, Tuple, Union
+import argparse, multiprocessing
+import ast, builtins, marshal, sys, types
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from collections import deque
+from multiprocessing import connection
 from queue import Queue
 
+# The memory limit of the worker processes is applied with the resource module which only exists on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
 from helpers.globals import *
 from helpers.utils import *
+import helpers.globals as test_globals
 
 root = "testcases"
 
+# The test cases of a problem are read through a test plan: the JSON files of its directory are parsed once and
+# every expression they contain (the function, the comparator and their arguments) is compiled once (see compile_expression).
+# The plan is kept in memory and saved in the "__pycache__" folder of the directory, so the next runs of the autograder
+# (for example, by the batch grader) skip the parsing. Only data is saved (the test cases and the values of their literals),
+# the other expressions are always checked and compiled again by the process that evaluates them (see compile_expression).
+# A plan is rebuilt when a JSON file is added, removed or modified, or when the autograder itself is modified.
+
+PLAN_FILENAME = "test_plan.marshal"
+
+# The builtins that the expressions of the test cases can use
+ALLOWED_BUILTINS = {name: getattr(builtins, name) for name in (
+    "abs", "all", "any", "bool", "dict", "enumerate", "float", "frozenset", "int", "len", "list",
+    "max", "min", "range", "reversed", "round", "set", "sorted", "str", "sum", "tuple", "zip",
+)}
+
+# The syntax that the expressions of the test cases can use: literals, names, attributes, calls, arithmetic,
+# lambdas and comprehensions. Anything else (such as assignments or subscripts) is rejected when the expression is compiled
+ALLOWED_NODES = (
+    ast.Expression, ast.Constant, ast.Name, ast.Load, ast.Store, ast.Attribute, ast.Call, ast.keyword, ast.Starred,
+    ast.Tuple, ast.List, ast.Dict, ast.Set, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp, ast.comprehension,
+    ast.UnaryOp, ast.UAdd, ast.USub, ast.BinOp, ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.Lambda, ast.arguments, ast.arg,
+)
+
+_expression_namespace: Optional[Dict[str, Any]] = None
+
+# Returns the global names that the expressions of the test cases can use
+# These are the public names of "helpers/globals.py", the comparators and load_function (which only loads the modules of the problem set)
+# The builtins are replaced by ALLOWED_BUILTINS so functions such as open, eval or __import__ are not available
+def expression_namespace() -> Dict[str, Any]:
+    global _expression_namespace
+    if _expression_namespace is None:
+        namespace = {name: value for name, value in vars(test_globals).items() if not name.startswith("_")}
+        namespace.update(
+            load_function=load_function,
+            default_comparator=default_comparator,
+            approximate_comparator=approximate_comparator,
+        )
+        namespace["__builtins__"] = ALLOWED_BUILTINS
+        _expression_namespace = namespace
+    return _expression_namespace
+
+# The expressions of the test cases are restricted, they are not sandboxed: they can only call the functions and classes
+# exported to them, but those run with the full rights of the autograder. The test cases must still come from a trusted source.
+# check_expression raises a ValueError if the expression:
+# - uses a syntax that is not in ALLOWED_NODES,
+# - uses a private attribute (which blocks accessing the internals of the objects such as __class__ or __globals__),
+# - uses a name that is not defined in expression_namespace, ALLOWED_BUILTINS or the expression itself (its lambda parameters and comprehension variables),
+# - accesses a member of a module that was not defined in this module (for example, test_tools.os or test_tools.load_function),
+# - calls anything but a global name, a function loaded by load_function or their attributes (for example, a lambda parameter),
+# - calls load_function with anything but a constant string naming a module of the problem set.
+def check_expression(tree: ast.Expression, source: str) -> None:
+    nodes = list(ast.walk(tree))
+    local_names = {node.arg for node in nodes if isinstance(node, ast.arg)}
+    local_names.update(node.id for node in nodes if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store))
+    namespace = expression_namespace()
+    def reject(reason: str):
+        raise ValueError(f"{reason} is not allowed in the expression: {source}")
+    # Returns the global value referred to by a name or an attribute of a global name (or None if it is not global)
+    # The values loaded by load_function are only known when the expression is evaluated, so they are represented by load_function itself
+    def resolve(node: ast.AST) -> Any:
+        if isinstance(node, ast.Call) and resolve(node.func) is load_function:
+            return load_function
+        if isinstance(node, ast.Name):
+            if node.id in local_names: return None
+            return namespace.get(node.id, ALLOWED_BUILTINS.get(node.id))
+        if isinstance(node, ast.Attribute):
+            value = resolve(node.value)
+            if isinstance(value, types.ModuleType):
+                member = getattr(value, node.attr, None)
+                if member is None or getattr(member, "__module__", None) != value.__name__:
+                    reject(f"The member {node.attr} of the module {value.__name__}")
+                return member
+            if value is load_function: return load_function
+            return None if value is None else getattr(value, node.attr, None)
+        return None
+    for node in nodes:
+        if not isinstance(node, ALLOWED_NODES):
+            reject(type(node).__name__)
+        if isinstance(node, ast.Attribute):
+            if node.attr.startswith("_"): reject(f"The private attribute {node.attr}")
+            resolve(node)
+        elif isinstance(node, ast.Name) and node.id not in local_names:
+            if node.id.startswith("_") or (node.id not in namespace and node.id not in ALLOWED_BUILTINS):
+                reject(f"The name {node.id}")
+        elif isinstance(node, ast.Call):
+            function = resolve(node.func)
+            if function is None:
+                reject(f"Calling {ast.unparse(node.func)}")
+            if node.func.__class__ is ast.Name and node.func.id == "load_function":
+                if len(node.args) != 1 or node.keywords or not isinstance(node.args[0], ast.Constant) or not isinstance(node.args[0].value, str):
+                    reject("Calling load_function without a constant string")
+                module = node.args[0].value.rsplit(".", 1)[0]
+                if not module.isidentifier() or not os.path.isfile(os.path.join(PROBLEM_SET_PATH, module + ".py")):
+                    reject(f"Loading from the module {module}")
+
+# Returns true if the value can be shared between the test cases (it can not be modified by a test case)
+def is_immutable(value: Any) -> bool:
+    if isinstance(value, (tuple, frozenset)):
+        return all(is_immutable(item) for item in value)
+    return value is None or isinstance(value, (bool, int, float, complex, str, bytes))
+
+# An expression of a test case after compilation
+# If the expression is an immutable literal (such as a number, a string or a tuple of numbers), its value is stored and returned as is.
+# Otherwise, its code is stored and evaluated whenever the value is needed, so every test case gets a new object
+# (a test case could modify a list or a dictionary that it receives)
+class CompiledExpression:
+    __slots__ = ("source", "code", "value")
+
+    def __init__(self, source: str, code: Any, value: Any) -> None:
+        self.source = source
+        self.code = code
+        self.value = value
+
+    def evaluate(self) -> Any:
+        if self.code is None: return self.value
+        return eval(self.code, expression_namespace())
+
+    # The compiled code can not be pickled, so the expression is compiled again when it is sent to a worker process
+    def __reduce__(self):
+        return (compile_expression, (self.source,))
+
+_compiled_expressions: Dict[str, CompiledExpression] = {}
+
+# Returns the compiled expression of the given source (each source is compiled once)
+def compile_expression(source: str) -> CompiledExpression:
+    compiled = _compiled_expressions.get(source)
+    if compiled is None:
+        tree = ast.parse(source, mode="eval")
+        try:
+            value = ast.literal_eval(tree)
+            literal = True
+        except (ValueError, TypeError, SyntaxError):
+            literal = False
+        # A literal can only contain constants, so only the other expressions are checked
+        if not literal:
+            check_expression(tree, source)
+        if literal and is_immutable(value):
+            compiled = CompiledExpression(source, None, value)
+        else:
+            compiled = CompiledExpression(source, compile(source, "<test case>", "eval"), None)
+        _compiled_expressions[source] = compiled
+    return compiled
+
+# Evaluate an expression of a test case
+def evaluate(source: str) -> Any:
+    return compile_expression(source).evaluate()
+
+# Returns the sources of the expressions in a test case (or in the description of a problem)
+def test_case_expressions(test_case: Dict[str, Any]) -> List[str]:
+    sources = [test_case[key] for key in ("function", "comparator") if key in test_case]
+    for key in ("input_args", "comparison_args"):
+        sources.extend(test_case.get(key, []))
+    for key in ("input_kwargs", "comparison_kwargs"):
+        sources.extend(test_case.get(key, {}).values())
+    return sources
+
+# Returns the key of the plan of a directory: the names, sizes and modification times of its JSON files
+# in addition to the modification time of the autograder and the python version
+def test_plan_key(path: str) -> Tuple:
+    files = sorted(
+        (entry.name, entry.stat().st_size, entry.stat().st_mtime_ns)
+        for entry in os.scandir(path)
+        if not entry.name.startswith("__") and entry.name.endswith(".json") and entry.is_file()
+    )
+    return (sys.version, os.stat(__file__).st_mtime_ns, tuple(files))
+
+_test_plans: Dict[str, Tuple[Tuple, List[Tuple[str, Dict[str, Any]]]]] = {}
+
+# Returns the test cases of a directory (with their filenames)
+# The plan is loaded from the memory, or from the "__pycache__" folder of the directory if it is still valid. Otherwise, it is built and saved.
+def load_test_plan(path: str) -> List[Tuple[str, Dict[str, Any]]]:
+    key = test_plan_key(path)
+    cached = _test_plans.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    plan_path = os.path.join(path, "__pycache__", PLAN_FILENAME)
+    plan = None
+    try:
+        with open(plan_path, 'rb') as f:
+            saved_key, saved_plan, literals = marshal.load(f)
+        if saved_key == key:
+            plan = saved_plan
+            # Only the immutable literal values are loaded, anything else in the file is ignored
+            for source, value in literals:
+                if isinstance(source, str) and is_immutable(value):
+                    _compiled_expressions.setdefault(source, CompiledExpression(source, None, value))
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    if plan is None:
+        plan = []
+        for filename, _, _ in key[2]:
+            with open(os.path.join(path, filename), 'r') as f:
+                plan.append((filename, json.load(f)))
+        compiled = [compile_expression(source) for _, test_case in plan for source in test_case_expressions(test_case)]
+        literals = [(expression.source, expression.value) for expression in compiled if expression.code is None]
+        # Write to a temporary file then rename it so that a partial plan is never read (the cache is optional, so errors are ignored)
+        try:
+            os.makedirs(os.path.dirname(plan_path), exist_ok=True)
+            temporary_path = f"{plan_path}.{os.getpid()}.tmp"
+            with open(temporary_path, 'wb') as f:
+                marshal.dump((key, plan, literals), f)
+            os.replace(temporary_path, plan_path)
+        except (OSError, ValueError):
+            pass
+    _test_plans[path] = (key, plan)
+    return plan
+
 def get_test_cases(path: str, pattern: str) -> List[Dict[str, Any]]:
-    test_cases = []
-    for filename in os.listdir(path):
-        if filename.startswith("__"): continue
-        if not fnmatch.fnmatchcase(filename, pattern): continue
-        filepath = os.path.join(path, filename)
-        if os.path.isfile(filepath) and os.path.splitext(filepath)[1] == ".json":
-            test_cases.append(json.load(open(filepath, 'r')))
-    return test_cases
+    return [test_case for filename, test_case in load_test_plan(path) if fnmatch.fnmatchcase(filename, pattern)]
 
 def read_problems() -> Tuple[str, List[Dict[Any, str]]]:
-    data = json.load(open(os.path.join(root, "problems.json")))
+    with open(os.path.join(root, "problems.json"), 'r') as f:
+        data = json.load(f)
     return data.get("name", ""), data.get("problems", [])
 
 def raise_exception_in_thread(thread: threading.Thread, exception: Exception):
@@ -59,6 +272,139 @@ def run_test(fn: Callable, input_args: Arguments, cmp: Callable, cmp_args: Argum
     del thread
     return result
 
+# The tests can also run in a pool of worker processes (see the option --workers)
+# Unlike a thread, a worker process is killed for real when its test exceeds the time limit (even if it is running C code),
+# it can be given a memory limit, and every test runs in a new worker process, so the global state changed by a test
+# (such as a monkey patched function, a module global, an lru_cache or the tracked calls) does not reach the other tests.
+# The tests of all the problems are sent to the pool at once so all the workers stay busy.
+
+# Limit the address space of the current process to the given number of megabytes
+def set_memory_limit(megabytes: int) -> None:
+    if resource is None: return
+    limit = megabytes * 2**20
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+# The message sent by a worker once its test case is prepared, the time limit of the test case starts when the pool receives it
+WORKER_READY = "ready"
+
+# The main function of a worker process: receive a test case of a problem (given by the arguments used to create it),
+# run it and send back its result (or stop if it receives None)
+# Like in Problem.run, the test case is prepared (its expressions are evaluated) before the time limit starts:
+# the worker sends WORKER_READY once it is prepared, so the process startup and the preparation are not timed
+# A worker runs a single test case then exits (like maxtasksperchild=1), the pool starts a new worker for the next test case
+def worker_main(pipe: connection.Connection, solution: str, memory_limit: Optional[int]) -> None:
+    set_solution_path(solution)
+    if memory_limit: set_memory_limit(memory_limit)
+    task = pipe.recv()
+    if task is None: return
+    problem_kwargs, test_case = task
+    try:
+        fn, input_args, cmp, cmp_args = Problem(**problem_kwargs).prepare(test_case)
+        pipe.send(WORKER_READY)
+        output = fn(*input_args.args, **input_args.kwargs)
+        result = cmp(output, *cmp_args.args, **cmp_args.kwargs)
+    except NotImplementedError as err:
+        result = None
+    except MemoryError:
+        result = Result(False, 0, "Memory Limit Exceeded")
+    except:
+        result = Result(False, 0, traceback.format_exc())
+    pipe.send(result)
+
+# A worker process with the pipe used to talk to it and the test case it is currently running (if any)
+# The deadline of the test case is only set once the worker is ready (see worker_main)
+class TestWorker:
+    __slots__ = ("process", "pipe", "ticket", "timeout", "deadline")
+
+    def __init__(self, solution: str, memory_limit: Optional[int]) -> None:
+        self.pipe, child_pipe = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_pipe, solution, memory_limit), daemon=True)
+        self.process.start()
+        child_pipe.close()
+        self.ticket: Optional[int] = None
+        self.timeout: Optional[float] = None
+        self.deadline: Optional[float] = None
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.pipe.close()
+
+# The pool runs the submitted test cases on its workers. Every worker is replaced after its test case, whether the test
+# finished, crashed or exceeded its time limit (then the worker is killed), so the other tests are not affected
+class TestPool:
+    def __init__(self, workers: int, solution: str, memory_limit: Optional[int]) -> None:
+        self.solution, self.memory_limit = solution, memory_limit
+        self.workers = [TestWorker(solution, memory_limit) for _ in range(workers)]
+        self.tasks = deque()
+        self.results: Dict[int, Union[Result, None]] = {}
+        self.tickets = 0
+
+    # Queue a test case and return the ticket used to retrieve its result. The timeout is in seconds (None to disable it)
+    def submit(self, problem_kwargs: Dict[str, Any], test_case: Dict[str, Any], timeout: Optional[float]) -> int:
+        ticket = self.tickets
+        self.tickets += 1
+        self.tasks.append((ticket, (problem_kwargs, test_case), timeout))
+        return ticket
+
+    # Wait for the result of the given ticket (the other test cases keep running meanwhile)
+    def result(self, ticket: int) -> Union[Result, None]:
+        while ticket not in self.results:
+            self.step()
+        return self.results.pop(ticket)
+
+    def replace(self, index: int) -> None:
+        self.workers[index].kill()
+        self.workers[index] = TestWorker(self.solution, self.memory_limit)
+
+    # Give a test case to every idle worker then wait until a worker finishes or exceeds its time limit
+    def step(self) -> None:
+        for index, worker in enumerate(self.workers):
+            while worker.ticket is None and self.tasks:
+                ticket, task, timeout = self.tasks[0]
+                try:
+                    worker.pipe.send(task)
+                except OSError:
+                    # The worker died while it was idle, replace it and try again
+                    self.replace(index)
+                    worker = self.workers[index]
+                    continue
+                self.tasks.popleft()
+                worker.ticket, worker.timeout = ticket, timeout
+        busy = [worker for worker in self.workers if worker.ticket is not None]
+        deadlines = [worker.deadline for worker in busy if worker.deadline is not None]
+        wait_time = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        # A pipe becomes ready when the worker sends its result or when the worker process dies (end of file)
+        ready = connection.wait([worker.pipe for worker in busy], wait_time)
+        for worker in busy:
+            index = self.workers.index(worker)
+            if worker.pipe in ready:
+                try:
+                    message = worker.pipe.recv()
+                except (EOFError, OSError):
+                    message = Result(False, 0, "Run Failed")
+                if isinstance(message, str) and message == WORKER_READY:
+                    if worker.timeout is not None:
+                        worker.deadline = time.monotonic() + worker.timeout
+                    continue
+                self.results[worker.ticket] = message
+                self.replace(index)
+            elif worker.deadline is not None and time.monotonic() >= worker.deadline:
+                self.results[worker.ticket] = Result(False, 0, "Timeout")
+                self.replace(index)
+
+    # Stop all the workers (the running tests are killed)
+    def close(self) -> None:
+        for worker in self.workers:
+            if worker.ticket is None:
+                try:
+                    worker.pipe.send(None)
+                except OSError:
+                    pass
+                worker.process.join(1)
+            worker.kill()
+
 def default_comparator(output, expected):
     success = output == expected
     grade = (1 if success else 0)
@@ -79,22 +425,51 @@ def approximate_comparator(output, expected):
 
 class Problem:
     def __init__(self, **kwargs) -> None:
+        self.kwargs = kwargs # These are used to create the same problem in the worker processes
         self.name = kwargs.get("name", "Unnamed Problem")
         self.testcases_path = kwargs.get("testcases_path", self.name)
         self.default_fn = lambda x: x
-        if "function" in kwargs: self.default_fn = eval(kwargs["function"])
+        if "function" in kwargs: self.default_fn = evaluate(kwargs["function"])
         self.default_cmp = default_comparator
-        if "comparator" in kwargs: self.default_cmp = eval(kwargs["comparator"])
+        if "comparator" in kwargs: self.default_cmp = evaluate(kwargs["comparator"])
         self.weight = kwargs.get("weight", 1)
         self.default_timeout = kwargs.get("timeout", 1)
         self.grade = 0
         self.maximum_grade = 0
+        self.results: List[Dict[str, Any]] = [] # The results of the last run (used for the JSON report)
     
-    def run(self, is_debug: bool = False, pattern: str = "*", time_scale: float = 1):
+    # Evaluate the function, the comparator and their arguments for the given test case (see compile_expression)
+    def prepare(self, test_case: Dict[str, Any]) -> Tuple[Callable, Arguments, Callable, Arguments]:
+        fn = self.default_fn
+        if "function" in test_case: fn = evaluate(test_case["function"])
+        fn_args = Arguments(
+            [evaluate(arg) for arg in test_case.get("input_args", [])],
+            {key:evaluate(value) for key, value in test_case.get("input_kwargs", {}).items()})
+        cmp = self.default_cmp
+        if "comparator" in test_case: cmp = evaluate(test_case["comparator"])
+        cmp_args = Arguments(
+            [evaluate(arg) for arg in test_case.get("comparison_args", [])],
+            {key:evaluate(value) for key, value in test_case.get("comparison_kwargs", {}).items()})
+        return fn, fn_args, cmp, cmp_args
+
+    # Returns the test cases that match the pattern
+    def test_cases(self, pattern: str = "*") -> List[Dict[str, Any]]:
+        return get_test_cases(os.path.join(root, self.testcases_path), pattern)
+
+    # Returns the time limit of the test case in seconds (None in debug mode)
+    def timeout(self, test_case: Dict[str, Any], is_debug: bool, time_scale: float) -> Optional[float]:
+        return None if is_debug else test_case.get("timeout", self.default_timeout) * time_scale
+
+    # Run the test cases that match the pattern and print their results
+    # If a pool and the tickets of the test cases are given, the results are retrieved from the pool
+    # instead of running the test cases in this process
+    def run(self, is_debug: bool = False, pattern: str = "*", time_scale: float = 1,
+            pool: Optional[TestPool] = None, tickets: Optional[List[int]] = None):
         print(f"Problem: {self.name}")
-        test_cases = get_test_cases(os.path.join(root, self.testcases_path), pattern)
+        test_cases = self.test_cases(pattern)
         self.grade = 0
         self.maximum_grade = 0
+        self.results = []
         for test_index, test_case in enumerate(test_cases):
             description = test_case.get("description", f"Test Case {test_index+1}")
             timeout = test_case.get("timeout", self.default_timeout)
@@ -102,33 +477,36 @@ class Problem:
                 print(f"{test_index+1}: {description} :: time-limit is turned off in debug mode")
             else:
                 print(f"{test_index+1}: {description} :: time-limit = {timeout*time_scale} sec")
-            fn = self.default_fn
-            if "function" in test_case: fn = eval(test_case["function"])
             input_args = test_case.get("input_args", [])
             input_kwargs = test_case.get("input_kwargs", {})
-            fn_args = Arguments(
-                [eval(arg) for arg in input_args], {key:eval(value) for key, value in input_kwargs.items()})
-            cmp = self.default_cmp
-            if "comparator" in test_case: cmp = eval(test_case["comparator"])
-            cmp_args = Arguments(
-                [eval(arg) for arg in test_case.get("comparison_args", [])],
-                {key:eval(value) for key, value in test_case.get("comparison_kwargs", {}).items()})
             weight = test_case.get("weight", 1)
             maximum_grade = self.weight * weight * test_case.get("maximum_grade", 1)
             self.maximum_grade += maximum_grade
-            result = run_test(fn, fn_args, cmp, cmp_args, (None if is_debug else timeout * time_scale))
+            if pool is not None:
+                result = pool.result(tickets[test_index])
+            else:
+                fn, fn_args, cmp, cmp_args = self.prepare(test_case)
+                result = run_test(fn, fn_args, cmp, cmp_args, self.timeout(test_case, is_debug, time_scale))
             if result is None:
                 print("Function is not implemented yet")
+                self.results.append({"description": description, "success": False, "grade": 0, "maximum_grade": maximum_grade, "message": "Function is not implemented yet"})
                 continue
             grade = self.weight * weight * result.grade
+            self.results.append({
+                "description": description,
+                "success": result.success,
+                "grade": grade,
+                "maximum_grade": maximum_grade,
+                "message": result.message,
+            })
             if result.success:
-                print(f"Result: PASS {grade}/{maximum_grade}", end="")
+                print(f"Result: PASS {grade:g}/{maximum_grade:g}", end="")
                 if result.message:
                     print(" -", result.message)
                 else:
                     print()
             else:
-                print(f"Result: FAIL {grade}/{maximum_grade} - {result.message}")
+                print(f"Result: FAIL {grade:g}/{maximum_grade:g} - {result.message}")
                 if input_args:
                     print("Input positional arguments:")
                     for arg in input_args: print(f"- {arg}")
@@ -137,7 +515,7 @@ class Problem:
                     for key, val in input_kwargs.items(): print(f"- {key}: {val}")
                 print()
             self.grade += grade
-        print(f"Total {self.grade}/{self.maximum_grade}")
+        print(f"Total {self.grade:g}/{self.maximum_grade:g}")
 
 def main(args: argparse.Namespace):
     time_scale = args.timescale
@@ -173,12 +551,39 @@ def main(args: argparse.Namespace):
             pass
     else:
         problems = [(problem, "*") for index, problem in enumerate(problems)]
-    for problem, pattern in problems:
-        problem.run(args.debug, pattern, time_scale)
-        print()
-        total_grade += problem.grade
-        maximum_grade += problem.maximum_grade
-    print(f"Problem Set Total {total_grade}/{maximum_grade}\n")
+    pool = None
+    tickets = [None] * len(problems)
+    if args.workers is not None:
+        # Load the test plans before starting the workers, so the workers inherit the compiled expressions (if they are forked)
+        test_cases = [problem.test_cases(pattern) for problem, pattern in problems]
+        # Send the test cases of all the problems to the pool before printing the results of the first problem
+        pool = TestPool(args.workers or os.cpu_count() or 1, args.solution, args.memory)
+        tickets = [
+            [pool.submit(problem.kwargs, test_case, problem.timeout(test_case, args.debug, time_scale)) for test_case in problem_test_cases]
+            for (problem, _), problem_test_cases in zip(problems, test_cases)
+        ]
+    try:
+        for (problem, pattern), problem_tickets in zip(problems, tickets):
+            problem.run(args.debug, pattern, time_scale, pool, problem_tickets)
+            print()
+            total_grade += problem.grade
+            maximum_grade += problem.maximum_grade
+    finally:
+        if pool is not None: pool.close()
+    # If requested, write the grades of every problem and test case as JSON
+    if args.report:
+        report = {
+            "name": name,
+            "grade": total_grade,
+            "maximum_grade": maximum_grade,
+            "problems": [
+                {"name": problem.name, "grade": problem.grade, "maximum_grade": problem.maximum_grade, "tests": problem.results}
+                for problem, _ in problems
+            ],
+        }
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(f"Problem Set Total {total_grade:g}/{maximum_grade:g}\n")
     #exit(total_grade)
 
 if __name__ == "__main__":
@@ -187,5 +592,8 @@ if __name__ == "__main__":
     parser.add_argument("--debug", "-d", action="store_true", help="Disables timeout to enable debugging via the autograder")
     parser.add_argument("--timescale", "-t", type=str, default="default", help="A scaling factor for the timeout")
     parser.add_argument("--solution", "-s", default="")
+    parser.add_argument("--workers", "-w", type=int, default=None, help="Run the testcases in this number of worker processes (0 uses the number of CPUs). By default, the testcases run one by one in this process")
+    parser.add_argument("--memory", "-m", type=int, default=None, help="The memory limit in megabytes of each worker process (only on Unix)")
+    parser.add_argument("--report", "-r", default=None, help="Write the grades of every problem and testcase as JSON to this file")
     args = parser.parse_args()
     main(args)
\ No newline at end of file
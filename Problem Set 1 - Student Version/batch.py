@@ -0,0 +1,205 @@
+from typing import Any, Dict, Iterator, List, Optional
+from collections import deque
+from enum import Enum
+from multiprocessing import connection
+import argparse, glob, json, multiprocessing, os, sys, time
+
+from portfolio import DEFAULT_STRATEGIES, Strategy, StrategyStatus, format_action, run_strategy
+
+# The memory limit is applied with the resource module which only exists on Unix
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# This file contains the batch solver which solves many problem files with a single strategy over a pool of worker processes
+# Every result is written as a JSON line as soon as it is available
+# A worker that exceeds the time limit is killed and a worker that crashes is replaced, the other tasks are not affected
+
+class BatchStatus(str, Enum):
+    SOLVED  = "solved"   # A solution was found
+    FAILED  = "failed"   # The search finished without finding a solution
+    TIMEOUT = "timeout"  # The task exceeded the time limit (the worker was killed)
+    MEMORY  = "memory"   # The task exceeded the memory limit
+    CRASHED = "crashed"  # The worker process died while solving the task
+    ERROR   = "error"    # The task raised an exception (for example, the file could not be parsed)
+
+# Limit the address space of the current process to the given number of megabytes
+def set_memory_limit(megabytes: int) -> None:
+    if resource is None: return
+    limit = megabytes * 2**20
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+# Solve a single problem file and return its JSON record. This function runs in the worker processes
+def solve_task(path: str, domain: str, strategy: Strategy, options: Dict[str, Any], include_solution: bool) -> Dict[str, Any]:
+    try:
+        result = run_strategy(domain, path, strategy, options)
+    except MemoryError:
+        return {"path": path, "status": BatchStatus.MEMORY.value}
+    except Exception as error:
+        return {"path": path, "status": BatchStatus.ERROR.value, "error": repr(error)}
+    status = BatchStatus.SOLVED if result.status == StrategyStatus.SOLVED else BatchStatus.FAILED
+    record = {
+        "path": path,
+        "status": status.value,
+        "cost": result.cost,
+        "length": None if result.solution is None else len(result.solution),
+        "explored": result.explored,
+        "search_seconds": result.elapsed,
+    }
+    if include_solution and result.solution is not None:
+        record["solution"] = " ".join(format_action(action) for action in result.solution)
+    return record
+
+# The main loop of a worker process: receive a task, solve it and send back its record until it receives None
+def worker_main(pipe: connection.Connection, memory_limit: Optional[int]) -> None:
+    if memory_limit: set_memory_limit(memory_limit)
+    while True:
+        task = pipe.recv()
+        if task is None: return
+        pipe.send(solve_task(*task))
+
+# A worker process with the pipe used to talk to it and the task it is currently solving (if any)
+class Worker:
+    __slots__ = ("process", "pipe", "path", "started")
+
+    def __init__(self, memory_limit: Optional[int]) -> None:
+        self.pipe, child_pipe = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=worker_main, args=(child_pipe, memory_limit), daemon=True)
+        self.process.start()
+        child_pipe.close()
+        self.path: Optional[str] = None
+        self.started = 0.0
+
+    # Kill the worker process (used for the timeouts and when the batch is interrupted)
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.pipe.close()
+
+    # Ask the worker process to exit after its current task, and kill it if it does not exit in time
+    def stop(self, timeout: float = 1.0) -> None:
+        try:
+            self.pipe.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout)
+        self.kill()
+
+# Solve every problem file over a pool of worker processes and yield the record of each file when it is done
+# The records are yielded in the order of completion (not in the order of the paths)
+# The timeout is in seconds (per file) and the memory limit is in megabytes (per worker process)
+def run_batch(paths: List[str], domain: str, strategy: Strategy, options: Optional[Dict[str, Any]] = None,
+              workers: Optional[int] = None, timeout: Optional[float] = None, memory_limit: Optional[int] = None,
+              include_solution: bool = False) -> Iterator[Dict[str, Any]]:
+    options = options or {}
+    tasks = deque(paths)
+    pool = [Worker(memory_limit) for _ in range(min(workers or os.cpu_count() or 1, len(paths)))]
+    try:
+        while True:
+            # Give a task to every idle worker. If the worker died while idle, it is replaced before retrying
+            for index, worker in enumerate(pool):
+                while worker.path is None and tasks:
+                    path = tasks[0]
+                    try:
+                        worker.pipe.send((path, domain, strategy, options, include_solution))
+                    except OSError:
+                        worker.kill()
+                        worker = pool[index] = Worker(memory_limit)
+                        continue
+                    tasks.popleft()
+                    worker.path, worker.started = path, time.monotonic()
+            busy = [worker for worker in pool if worker.path is not None]
+            if not busy: break
+            wait_time = None
+            if timeout is not None:
+                wait_time = max(0.0, min(worker.started for worker in busy) + timeout - time.monotonic())
+            # A pipe becomes ready when the worker sends its record or when the worker process dies (end of file)
+            ready = connection.wait([worker.pipe for worker in busy], wait_time)
+            for worker in busy:
+                index = pool.index(worker)
+                elapsed = time.monotonic() - worker.started
+                if worker.pipe in ready:
+                    try:
+                        record = worker.pipe.recv()
+                    except (EOFError, OSError):
+                        worker.process.join()
+                        record = {"path": worker.path, "status": BatchStatus.CRASHED.value, "exitcode": worker.process.exitcode}
+                        worker.kill()
+                        pool[index] = Worker(memory_limit)
+                    else:
+                        worker.path = None
+                elif timeout is not None and elapsed >= timeout:
+                    record = {"path": worker.path, "status": BatchStatus.TIMEOUT.value}
+                    worker.kill()
+                    pool[index] = Worker(memory_limit)
+                else:
+                    continue
+                record["seconds"] = elapsed
+                yield record
+    finally:
+        for worker in pool:
+            if worker.path is None:
+                worker.stop()
+            else:
+                worker.kill()
+
+def main(args: argparse.Namespace):
+    paths = sorted({path for pattern in args.files for path in glob.glob(pattern)})
+    if not paths:
+        print("No files matched the given patterns", file=sys.stderr)
+        exit(-1)
+    strategy = Strategy.parse(args.strategy) if args.strategy else DEFAULT_STRATEGIES[args.domain][0]
+    options = {
+        "compact": args.compact,
+        "push": args.push,
+        "pruning": args.pruning,
+        "transposition": args.transposition,
+    }
+    output = open(args.output, "w") if args.output else sys.stdout
+    counts: Dict[str, int] = {}
+    start = time.time() # Track run time
+    try:
+        for record in run_batch(paths, args.domain, strategy, options, args.workers, args.timeout, args.memory, args.solutions):
+            counts[record["status"]] = counts.get(record["status"], 0) + 1
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+    finally:
+        if output is not sys.stdout: output.close()
+    summary = ", ".join(f"{status}: {count}" for status, count in sorted(counts.items()))
+    print(f"Solved {len(paths)} files with {strategy} ({summary}) in {time.time() - start:.3f} seconds", file=sys.stderr)
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Solve many sokoban levels or parking lots in parallel and write the results as JSON lines")
+    parser.add_argument("files", nargs="+", help="the files (or glob patterns) of the problems to solve")
+    parser.add_argument("--domain", "-dm", default="sokoban", choices=["sokoban", "parking", "graph"],
+                        help="the problem domain of the files")
+    parser.add_argument("--strategy", "-s", default=None,
+                        help="the strategy written as agent, agent:heuristic or wastar:heuristic:weight "
+                             "(default: the first strategy of the portfolio of the domain)")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="the number of worker processes (default: the number of CPUs)")
+    parser.add_argument("--timeout", "-t", type=float, default=None,
+                        help="the time limit in seconds for each file")
+    parser.add_argument("--memory", "-m", type=int, default=None,
+                        help="the memory limit in megabytes for each worker process (only on Unix)")
+    parser.add_argument("--output", "-o", default=None,
+                        help="the file to write the JSON lines to (default: the standard output)")
+    parser.add_argument("--solutions", action="store_true", default=False,
+                        help="Include the solution actions in the results")
+    parser.add_argument("--transposition", "-tt", type=int, default=0,
+                        help="the maximum number of states in the transposition table of IDA* (0 disables it)")
+    parser.add_argument("--compact", "-cp", action="store_true", default=False,
+                        help="Use the compact (integer indexed) sokoban or parking state")
+    parser.add_argument("--push", "-pu", action="store_true", default=False,
+                        help="Search over the crate pushes instead of the player steps")
+    parser.add_argument("--pruning", "-p", default="none", choices=["none", "dead", "freeze"],
+                        help="Prune the pushes that lead to deadlocks")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -0,0 +1,404 @@
+from typing import Callable, Dict, List
+from sokoban import SokobanProblem, CompactSokobanProblem, SokobanPushProblem, SokobanPruning, push_level_search
+from helpers.utils import fetch_tracked_call_count
+from functools import lru_cache
+import argparse, glob, time, tracemalloc
+
+# This file contains the benchmarks used to measure the performance of the search code
+# Each benchmark is a subcommand, run "python benchmark.py -h" to see the available benchmarks
+
+# Return the search function selected by the user with the heuristic (if any) already bound to it
+def get_search_function(agent: str, heuristic_name: str, transposition_size: int = 0) -> Callable:
+    import search
+    if agent in ("bfs", "dfs", "ucs"):
+        return {
+            "bfs": search.BreadthFirstSearch,
+            "dfs": search.DepthFirstSearch,
+            "ucs": search.UniformCostSearch,
+        }[agent]
+    from play_sokoban import get_heuristic
+    heuristic = lru_cache(2**16)(get_heuristic(heuristic_name))
+    if agent == "idastar":
+        return lambda problem, state: search.IterativeDeepeningAStarSearch(problem, state, heuristic, transposition_size)
+    search_fn = {
+        "astar": search.AStarSearch,
+        "gbfs": search.BestFirstSearch,
+    }[agent]
+    return lambda problem, state: search_fn(problem, state, heuristic)
+
+# Solve every sokoban level and report the path length, the explored nodes, the nodes/sec and the peak memory
+def benchmark_search(args: argparse.Namespace):
+    problem_class = CompactSokobanProblem if args.compact else SokobanProblem
+    # When searching over the pushes, the explored nodes are counted on the push level problem
+    tracked_class = SokobanPushProblem if args.push else problem_class
+    results: List[Dict] = []
+    for level in sorted(glob.glob(args.levels)):
+        problem = problem_class.from_file(level)
+        problem.pruning = SokobanPruning(args.pruning)
+        search_fn = get_search_function(args.agent, args.heuristic, args.transposition)
+        if args.push: search_fn = push_level_search(search_fn)
+        fetch_tracked_call_count(tracked_class.get_actions) # Clear the call counter
+        if args.memory: tracemalloc.start()
+        start = time.perf_counter()
+        path = search_fn(problem, problem.get_initial_state())
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if args.memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        explored = fetch_tracked_call_count(tracked_class.get_actions)
+        results.append({
+            "level": level,
+            "length": None if path is None else len(path),
+            "explored": explored,
+            "seconds": elapsed,
+            "nodes/sec": explored / elapsed if elapsed > 0 else 0,
+            "peak memory (MB)": peak / 2**20,
+        })
+        print(f"{level}: path length = {results[-1]['length']}, explored = {explored} nodes, "
+              f"time = {elapsed:.3f} sec, {results[-1]['nodes/sec']:.0f} nodes/sec"
+              + (f", peak memory = {peak / 2**20:.2f} MB" if args.memory else ""))
+    return results
+
+# Compare the pushes/pops per second of the heapq based frontier against queue.PriorityQueue with a Python-level __lt__
+def benchmark_frontier(args: argparse.Namespace):
+    from frontier import PriorityFrontier
+    from queue import PriorityQueue
+    import random
+
+    # This is the item that was used with queue.PriorityQueue before the frontier was introduced
+    class PQItem:
+        def __init__(self, cost: float, node, time: int):
+            self.cost = cost
+            self.node = node
+            self.time = time
+
+        def __lt__(self, other):
+            if self.cost == other.cost:
+                return self.time < other.time
+            return self.cost < other.cost
+
+    random.seed(args.seed)
+    # Use few distinct priorities to have a lot of ties like the ones in the search problems
+    priorities = [random.randint(0, 100) for _ in range(args.size)]
+
+    def run_priority_queue():
+        pq = PriorityQueue()
+        for time, priority in enumerate(priorities):
+            pq.put(PQItem(priority, None, time))
+        while not pq.empty():
+            pq.get()
+
+    def run_frontier():
+        frontier = PriorityFrontier()
+        for priority in priorities:
+            frontier.push(priority, None)
+        while frontier:
+            frontier.pop()
+
+    results = {}
+    for name, run in (("queue.PriorityQueue", run_priority_queue), ("PriorityFrontier", run_frontier)):
+        start = time.perf_counter()
+        run()
+        elapsed = time.perf_counter() - start
+        results[name] = 2 * args.size / elapsed
+        print(f"{name}: {args.size} pushes + {args.size} pops in {elapsed:.3f} sec, {results[name]:.0f} operations/sec")
+    return results
+
+# Compare the parking problem against the compact parking problem on every parking lot
+# For each lot, all the reachable states are enumerated then the actions and successors of every state are generated repeatedly
+# and the lot is solved with the selected search algorithm
+def benchmark_parking(args: argparse.Namespace):
+    from parking import ParkingProblem, CompactParkingProblem
+    from parking_heuristic import parking_heuristic
+    search_fn = get_search_function(args.agent, "zero")
+    if args.agent == "astar" and args.heuristic == "distance":
+        import search
+        search_fn = lambda problem, state: search.AStarSearch(problem, state, parking_heuristic)
+    results: List[Dict] = []
+    for park in sorted(glob.glob(args.parks)):
+        for problem_class in (ParkingProblem, CompactParkingProblem):
+            problem = problem_class.from_file(park)
+            # Enumerate the reachable states (at most args.states) with a breadth first traversal
+            initial_state = problem.get_initial_state()
+            states, visited = [initial_state], {initial_state}
+            for state in states:
+                if len(states) >= args.states: break
+                for action in problem.get_actions(state):
+                    next_state = problem.get_successor(state, action)
+                    if next_state not in visited:
+                        visited.add(next_state)
+                        states.append(next_state)
+            start = time.perf_counter()
+            transitions = 0
+            for _ in range(args.repeat):
+                for state in states:
+                    for action in problem.get_actions(state):
+                        problem.get_successor(state, action)
+                        transitions += 1
+            successor_elapsed = time.perf_counter() - start
+            fetch_tracked_call_count(problem_class.get_actions) # Clear the call counter
+            start = time.perf_counter()
+            for _ in range(args.repeat):
+                path = search_fn(problem, initial_state)
+            search_elapsed = (time.perf_counter() - start) / args.repeat
+            explored = fetch_tracked_call_count(problem_class.get_actions) // args.repeat
+            results.append({
+                "park": park,
+                "problem": problem_class.__name__,
+                "states": len(states),
+                "transitions/sec": transitions / successor_elapsed if successor_elapsed > 0 else 0,
+                "length": None if path is None else len(path),
+                "explored": explored,
+                "seconds": search_elapsed,
+            })
+            print(f"{park} ({problem_class.__name__}): {len(states)} states, {results[-1]['transitions/sec']:.0f} transitions/sec, "
+                  f"path length = {results[-1]['length']}, explored = {explored} nodes, time = {search_elapsed * 1000:.3f} ms")
+    return results
+
+# Generate a random graph routing problem where the nodes are on a jittered grid and each node is connected to its
+# 4 neighbors in both directions (some edges are removed at random).
+# The start and goal are on the middle row at a quarter of the width from each side so the searches are not bounded by the grid edges.
+def generate_graph(size: int, drop: float, seed: int):
+    from graph import GraphRoutingProblem, GraphNode
+    from mathutils import Point
+    import random
+    random.seed(seed)
+    nodes = {
+        (x, y): GraphNode(f"{x}_{y}", Point(10 * x + random.randint(-3, 3), 10 * y + random.randint(-3, 3)))
+        for x in range(size) for y in range(size)
+    }
+    adjacency = {node: [] for node in nodes.values()}
+    for (x, y), node in nodes.items():
+        for neighbor in ((x + 1, y), (x, y + 1)):
+            if neighbor in nodes and random.random() >= drop:
+                adjacency[node].append(nodes[neighbor])
+                adjacency[nodes[neighbor]].append(node)
+    return GraphRoutingProblem(nodes[(size // 4, size // 2)], nodes[(size - 1 - size // 4, size // 2)], adjacency)
+
+# Compare the bidirectional searches against UCS and A* on large generated graphs
+def benchmark_graph(args: argparse.Namespace):
+    from graph import GraphRoutingProblem, graphrouting_heuristic
+    from helpers.utils import fetch_recorded_calls
+    import search
+    algorithms = {
+        "ucs": search.UniformCostSearch,
+        "astar": lambda problem, state: search.AStarSearch(problem, state, graphrouting_heuristic),
+        "biucs": search.BidirectionalUniformCostSearch,
+        "biastar": lambda problem, state: search.BidirectionalAStarSearch(problem, state, graphrouting_heuristic),
+    }
+    results: List[Dict] = []
+    for seed in range(args.seed, args.seed + args.count):
+        problem = generate_graph(args.size, args.drop, seed)
+        for name, search_fn in algorithms.items():
+            fetch_recorded_calls(GraphRoutingProblem.get_actions) # Clear the recorded calls
+            start = time.perf_counter()
+            path = search_fn(problem, problem.get_initial_state())
+            elapsed = time.perf_counter() - start
+            explored = len(fetch_recorded_calls(GraphRoutingProblem.get_actions))
+            cost = None
+            if path is not None:
+                cost, state = 0, problem.get_initial_state()
+                for action in path:
+                    cost += problem.get_cost(state, action)
+                    state = problem.get_successor(state, action)
+            results.append({"seed": seed, "algorithm": name, "cost": cost, "explored": explored, "seconds": elapsed})
+            print(f"graph {seed} ({args.size}x{args.size}) - {name}: cost = {cost}, explored = {explored} nodes, time = {elapsed:.3f} sec")
+    return results
+
+# Generate a random sokoban level which is an empty room containing the given number of crates and goals
+def generate_room(crates: int, size: int, rng) -> str:
+    cells = [(x, y) for x in range(1, size - 1) for y in range(1, size - 1)]
+    chosen = rng.sample(cells, 2 * crates + 1)
+    tiles = {cell: "$" for cell in chosen[:crates]}
+    tiles.update({cell: "." for cell in chosen[crates:2 * crates]})
+    tiles[chosen[-1]] = "@"
+    return '\n'.join(
+        ''.join("#" if x in (0, size - 1) or y in (0, size - 1) else tiles.get((x, y), " ") for x in range(size))
+        for y in range(size)
+    )
+
+# Measure the heuristic evaluations per second on rooms with 4 to 10 crates
+# For each room, many random crate configurations are evaluated once (cold cache) and then a second time (cached)
+# The hungarian algorithm is also timed alone
+def benchmark_heuristic(args: argparse.Namespace):
+    from sokoban_heuristic import strong_heuristic, hungarian
+    from sokoban import SokobanState
+    import random
+    rng = random.Random(args.seed)
+    results: List[Dict] = []
+    for crates in range(args.min_crates, args.max_crates + 1):
+        problem = SokobanProblem.from_text(generate_room(crates, args.size, rng))
+        walkable = sorted(problem.layout.walkable, key=lambda point: (point.y, point.x))
+        states = [
+            SokobanState(problem.layout, problem.initial_state.player, frozenset(rng.sample(walkable, crates)))
+            for _ in range(args.states)
+        ]
+        result = {"crates": crates}
+        for name in ("cold", "cached"):
+            start = time.perf_counter()
+            for state in states:
+                strong_heuristic(problem, state)
+            result[f"heuristic {name} (evals/sec)"] = len(states) / (time.perf_counter() - start)
+        # A chain of states where each one moves a single crate of the previous one to a random empty cell
+        # is evaluated with the full heuristic and with the incremental heuristic (both on a cold cache)
+        chain = [states[0]]
+        for _ in range(args.states):
+            crates_set = chain[-1].crates
+            moved = rng.choice(sorted(crates_set, key=lambda point: (point.y, point.x)))
+            target = rng.choice([cell for cell in walkable if cell not in crates_set])
+            chain.append(SokobanState(problem.layout, problem.initial_state.player, crates_set - {moved} | {target}))
+        for name in ("full", "incremental"):
+            problem = SokobanProblem.from_text(str(states[0]))
+            start = time.perf_counter()
+            strong_heuristic(problem, chain[0])
+            for parent, state in zip(chain, chain[1:]):
+                if name == "full": strong_heuristic(problem, state)
+                else: strong_heuristic.incremental(problem, state, parent)
+            result[f"single push {name} (evals/sec)"] = len(chain) / (time.perf_counter() - start)
+        matrices = [[row for row in problem.cache()['rows'].values()][:crates]] * 100
+        start = time.perf_counter()
+        for matrix in matrices:
+            hungarian(matrix)
+        result["hungarian (evals/sec)"] = len(matrices) / (time.perf_counter() - start)
+        results.append(result)
+        print(', '.join(f"{key} = {value:.0f}" for key, value in result.items()))
+    return results
+
+# Compare the point arithmetic of mathutils against a plain frozen dataclass (the original definition of Point)
+# It also checks that both definitions give the same hashes and the same equality results
+def benchmark_point(args: argparse.Namespace):
+    from dataclasses import dataclass
+    from mathutils import Direction, Point, intern_point, neighbors
+    import random
+
+    @dataclass(frozen=True)
+    class PlainPoint:
+        __slots__ = ('x', 'y')
+        x: int
+        y: int
+
+        def __add__(self, other: 'PlainPoint') -> 'PlainPoint':
+            return PlainPoint(self.x + other.x, self.y + other.y)
+
+    rng = random.Random(args.seed)
+    coordinates = [(rng.randrange(args.size), rng.randrange(args.size)) for _ in range(args.count)]
+    implementations = [
+        ("plain", PlainPoint, lambda point, direction, vectors: point + vectors[direction]),
+        ("interned", intern_point, lambda point, direction, vectors: point + vectors[direction]),
+        ("neighbors", intern_point, lambda point, direction, vectors: neighbors(point)[direction]),
+    ]
+    results: List[Dict] = []
+    outputs = []
+    for name, point_factory, step in implementations:
+        points = [point_factory(x, y) for x, y in coordinates]
+        vectors = [point_factory(vector.x, vector.y) for vector in Direction._Vectors]
+        lookup = set(points)
+        # The points are moved many times (as a search visits the same cells many times)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            moved = [step(point, direction, vectors) for point in points for direction in Direction]
+        step_elapsed = (time.perf_counter() - start) / args.repeat
+        start = time.perf_counter()
+        found = sum(point in lookup for point in moved)
+        lookup_elapsed = time.perf_counter() - start
+        outputs.append(([hash(point) for point in moved], [point == other for point, other in zip(moved, reversed(moved))], found))
+        results.append({
+            "point": name,
+            "steps/sec": len(moved) / step_elapsed,
+            "lookups/sec": len(moved) / lookup_elapsed,
+        })
+        print(f"{name}: {results[-1]['steps/sec']:.0f} steps/sec, {results[-1]['lookups/sec']:.0f} lookups/sec, {found} found")
+    same = all(output == outputs[0] for output in outputs)
+    print(f"Hashes and equality are {'the same' if same else 'DIFFERENT'} for all the implementations")
+    return results
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Benchmark the performance of the search code")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    search_parser = subparsers.add_parser("search", help="solve sokoban levels and report the nodes/sec and the peak memory")
+    search_parser.add_argument("--levels", "-l", default="levels/level*.txt",
+                               help="a glob pattern for the sokoban levels to solve")
+    search_parser.add_argument("--agent", "-a", default="astar",
+                               choices=['bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'idastar'],
+                               help="the search algorithm to benchmark")
+    search_parser.add_argument("--heuristic", '-hf', default="strong",
+                               choices=["zero", "weak", "strong", "pdb"],
+                               help="choose the heuristic to use with A*, IDA* or Greedy Best First Search")
+    search_parser.add_argument("--transposition", "-tt", type=int, default=0,
+                               help="the maximum number of states in the transposition table of IDA* (0 disables it)")
+    search_parser.add_argument("--compact", "-cp", action="store_true",
+                               help="use the compact (integer indexed) sokoban state")
+    search_parser.add_argument("--push", "-pu", action="store_true",
+                               help="search over the crate pushes instead of the player steps")
+    search_parser.add_argument("--pruning", "-p", default="none",
+                               choices=[pruning.value for pruning in SokobanPruning],
+                               help="the deadlock pruning mode of the sokoban problem")
+    search_parser.add_argument("--memory", "-m", action="store_true",
+                               help="track the peak memory using tracemalloc (slows down the search)")
+    search_parser.set_defaults(run=benchmark_search)
+
+    frontier_parser = subparsers.add_parser("frontier", help="compare the pushes/pops per second of the priority frontiers")
+    frontier_parser.add_argument("--size", "-n", type=int, default=10**6,
+                                 help="the number of items to push then pop")
+    frontier_parser.add_argument("--seed", type=int, default=0,
+                                 help="the random seed used to generate the priorities")
+    frontier_parser.set_defaults(run=benchmark_frontier)
+
+    parking_parser = subparsers.add_parser("parking", help="compare the parking problem against the compact parking problem")
+    parking_parser.add_argument("--parks", "-l", default="parks/park*.txt",
+                                help="a glob pattern for the parking lots to solve")
+    parking_parser.add_argument("--agent", "-a", default="ucs",
+                                choices=['bfs', 'dfs', 'ucs', 'astar'],
+                                help="the search algorithm used to solve the parking lots")
+    parking_parser.add_argument("--heuristic", '-hf', default="distance",
+                                choices=["zero", "distance"],
+                                help="the heuristic used with A*")
+    parking_parser.add_argument("--states", type=int, default=10**5,
+                                help="the maximum number of reachable states to enumerate per parking lot")
+    parking_parser.add_argument("--repeat", "-r", type=int, default=20,
+                                help="the number of times the transitions are generated and the search is repeated")
+    parking_parser.set_defaults(run=benchmark_parking)
+
+    graph_parser = subparsers.add_parser("graph", help="compare the bidirectional searches against UCS and A* on generated graphs")
+    graph_parser.add_argument("--size", "-n", type=int, default=300,
+                              help="the graph is a grid of size x size nodes")
+    graph_parser.add_argument("--drop", type=float, default=0.2,
+                              help="the probability of removing an edge from the grid")
+    graph_parser.add_argument("--count", "-c", type=int, default=3,
+                              help="the number of graphs to generate")
+    graph_parser.add_argument("--seed", type=int, default=0,
+                              help="the random seed used to generate the first graph")
+    graph_parser.set_defaults(run=benchmark_graph)
+
+    heuristic_parser = subparsers.add_parser("heuristic", help="measure the strong heuristic evaluations/sec on generated rooms")
+    heuristic_parser.add_argument("--min-crates", type=int, default=4,
+                                  help="the number of crates in the first room")
+    heuristic_parser.add_argument("--max-crates", type=int, default=10,
+                                  help="the number of crates in the last room")
+    heuristic_parser.add_argument("--size", "-n", type=int, default=12,
+                                  help="the width and height of the rooms (including the walls)")
+    heuristic_parser.add_argument("--states", type=int, default=2000,
+                                  help="the number of random crate configurations to evaluate per room")
+    heuristic_parser.add_argument("--seed", type=int, default=0,
+                                  help="the random seed used to generate the rooms")
+    heuristic_parser.set_defaults(run=benchmark_heuristic)
+
+    point_parser = subparsers.add_parser("point", help="compare the point arithmetic against a plain frozen dataclass")
+    point_parser.add_argument("--size", "-n", type=int, default=50,
+                              help="the coordinates are sampled from a grid of size x size")
+    point_parser.add_argument("--count", "-c", type=int, default=10**5,
+                              help="the number of points to move in every direction")
+    point_parser.add_argument("--repeat", "-r", type=int, default=5,
+                              help="the number of times the points are moved")
+    point_parser.add_argument("--seed", type=int, default=0,
+                              help="the random seed used to sample the points")
+    point_parser.set_defaults(run=benchmark_point)
+
+    args = parser.parse_args()
+    try:
+        args.run(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -0,0 +1,37 @@
+from typing import Generic, List, Tuple, TypeVar
+from itertools import count
+import heapq
+
+# This file contains the frontier used by the priority based search functions (UCS, A* and Best First Search)
+
+T = TypeVar("T")
+
+# The priority frontier is a min-heap built on heapq (unlike queue.PriorityQueue, it does not lock on every operation)
+# Every entry is stored as a tuple (priority, tie-breaker, item) so the comparisons are done by the tuples in C
+# The tie-breaker is an increasing counter, so items with equal priorities are popped in FIFO order (insertion order)
+# Since the counter is unique, the items themselves are never compared
+class PriorityFrontier(Generic[T]):
+    __slots__ = ("heap", "counter")
+
+    def __init__(self) -> None:
+        self.heap: List[Tuple[float, int, T]] = []
+        self.counter = count()
+
+    # Add an item to the frontier with the given priority
+    def push(self, priority: float, item: T) -> None:
+        heapq.heappush(self.heap, (priority, next(self.counter), item))
+
+    # Remove and return the item with the lowest priority (and the earliest insertion if tied) along with its priority
+    def pop(self) -> Tuple[float, T]:
+        priority, _, item = heapq.heappop(self.heap)
+        return priority, item
+
+    # Return the lowest priority in the frontier without removing its item (the frontier must not be empty)
+    def peek_priority(self) -> float:
+        return self.heap[0][0]
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    def __bool__(self) -> bool:
+        return bool(self.heap)
@@ -1,6 +1,6 @@
-from typing import Dict, Iterable, List
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 from dataclasses import dataclass
-import json
+import json, math
 
 from problem import Problem
 from mathutils import Point, euclidean_distance
@@ -20,12 +20,21 @@ class GraphNode:
         return self.name
 
 # This is the implementation of the graph routing problem
+# The reverse adjacency maps every node to the nodes that have an edge to it, it is used by the bidirectional search
+# If it is not given, it is computed from the adjacency
 class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
-    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]]) -> None:
+    def __init__(self, start: GraphNode, goal: GraphNode, adjacency: Dict[GraphNode, List[GraphNode]],
+                 reverse_adjacency: Optional[Dict[GraphNode, List[GraphNode]]] = None) -> None:
         super().__init__()
         self.start = start
         self.goal = goal
         self.adjacency = adjacency
+        if reverse_adjacency is None:
+            reverse_adjacency = {node: [] for node in adjacency}
+            for node, adjacent in adjacency.items():
+                for next_node in adjacent:
+                    reverse_adjacency.setdefault(next_node, []).append(node)
+        self.reverse_adjacency = reverse_adjacency
     
     def get_initial_state(self) -> GraphNode:
         return self.start
@@ -46,7 +55,28 @@ class GraphRoutingProblem(Problem[GraphNode, GraphNode]):
     # The cost of an action is the distance between the current node and the next node 
     def get_cost(self, state: GraphNode, action: GraphNode) -> float:
         return euclidean_distance(state.position, action.position)
+
+    # Generate the successors and their costs in the same pass as the actions
+    def iter_successors(self, state: GraphNode) -> Iterator[Tuple[GraphNode, GraphNode, float]]:
+        if self.successor_replaced():
+            yield from super().iter_successors(state)
+            return
+        x, y = state.position
+        for action in self.get_actions(state):
+            dx, dy = x - action.position.x, y - action.position.y
+            yield action, action, math.sqrt(dx * dx + dy * dy)
+
+    # Returns the problem of going from the goal to the start by following the edges in reverse
+    # Since the cost is the distance between the nodes, the cost of every reversed edge is the same as the original edge
+    def reverse(self) -> 'GraphRoutingProblem':
+        return GraphRoutingProblem(self.goal, self.start, self.reverse_adjacency, self.adjacency)
     
+    # Returns a copy of the problem with its own adjacency lists (the nodes are immutable so they are shared)
+    def __copy__(self) -> 'GraphRoutingProblem':
+        return GraphRoutingProblem(self.start, self.goal,
+            {node: list(adjacent) for node, adjacent in self.adjacency.items()},
+            {node: list(adjacent) for node, adjacent in self.reverse_adjacency.items()})
+
     # Read a graph routing problem from file
     @staticmethod
     def from_file(path: str) -> 'GraphRoutingProblem':
@@ -1,4 +1,5 @@
 from helpers import test_tools
+from helpers.utils import load_problem
 from graph import GraphRoutingProblem
 from sokoban import SokobanProblem
 from sokoban_heuristic import weak_heuristic
\ No newline at end of file
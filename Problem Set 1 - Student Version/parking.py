@@ -1,7 +1,8 @@
-from typing import Any, Dict, Set, Tuple, List
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, Set, Tuple, List
 from problem import Problem
-from mathutils import Direction, Point
-from helpers.utils import NotImplemented
+from mathutils import Direction, Point, neighbors
+from helpers.utils import NotImplemented, track_call_count
 
 #TODO: (Optional) Instead of Any, you can define a type for the parking state
 ParkingState = Any
@@ -27,27 +28,41 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
         return all(car in self.slots and self.slots[car] == i for i, car in enumerate(state))
     
     # This function returns a list of all the possible actions that can be applied to the given state
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
     def get_actions(self, state: ParkingState) -> List[ParkingAction]:
         return [
             (i, direction) 
             for i, car in enumerate(state) 
-            for direction in Direction 
-            if (car + direction.to_vector()) in self.passages and (car + direction.to_vector()) not in state
+            for direction, position in zip(Direction, neighbors(car))
+            if position in self.passages and position not in state
         ]
     
     # This function returns a new state which is the result of applying the given action to the given state
     def get_successor(self, state: ParkingState, action: ParkingAction) -> ParkingState:
         i, direction = action
         new_state = list(state)
-        new_state[i] += direction.to_vector()
+        new_state[i] = neighbors(state[i])[direction]
         return tuple(new_state)
     
     # This function returns the cost of applying the given action to the given state
     def get_cost(self, state: ParkingState, action: ParkingAction) -> float:
         i, direction = action
-        new_car = state[i] + direction.to_vector()
+        new_car = neighbors(state[i])[direction]
         cost = 26 - i + (100 if new_car in self.slots and self.slots[new_car] != i else 0)
         return cost
+
+    # Generate the successors and their costs in the same pass as the actions
+    def iter_successors(self, state: ParkingState) -> Iterator[Tuple[ParkingAction, ParkingState, float]]:
+        if self.successor_replaced():
+            yield from Problem.iter_successors(self, state)
+            return
+        slots = self.slots
+        for action in self.get_actions(state):
+            i, direction = action
+            new_car = neighbors(state[i])[direction]
+            slot = slots.get(new_car, i)
+            yield action, state[:i] + (new_car,) + state[i+1:], 26 - i + (100 if slot != i else 0)
     
      # Read a parking problem from text containing a grid of tiles
     @staticmethod
@@ -79,4 +94,170 @@ class ParkingProblem(Problem[ParkingState, ParkingAction]):
     def from_file(path: str) -> 'ParkingProblem':
         with open(path, 'r') as f:
             return ParkingProblem.from_text(f.read())
-    
+
+
+# The following is a compact alternative to the parking state where the car positions are packed into a single integer
+# The compact layout assigns a dense index to every passage and precomputes the neighbor of every cell in every direction
+# The position of car 'i' is stored in the bits [i * bits, (i + 1) * bits) of the packed integer
+# and the state also stores a bitmask of the occupied cells, so checking if a cell is free is a single bit test
+@dataclass(eq=False, frozen=True)
+class CompactParkingLayout:
+    __slots__ = ("cells", "indices", "neighbors", "moves", "slots", "bits", "goal")
+    cells: Tuple[Point, ...]                            # The position of every cell index
+    indices: Dict[Point, int]                           # The index of every passage
+    neighbors: Tuple[Tuple[int, ...], ...]              # neighbors[cell][direction] is the index of the neighbor or -1 if it is a wall
+    moves: Tuple[Tuple[Tuple[Direction, int], ...], ...] # moves[cell] contains (direction, neighbor) for every neighbor that is not a wall
+    slots: Tuple[int, ...]                              # slots[cell] is the index of the car whose slot is on this cell or -1
+    bits: int                                           # The number of bits used to store the position of a car
+    goal: int                                           # The packed positions of the goal state (-1 if a car has no slot)
+
+    @staticmethod
+    def from_problem(problem: ParkingProblem) -> 'CompactParkingLayout':
+        cells = tuple(sorted(problem.passages, key=lambda point: (point.y, point.x)))
+        indices = {cell: index for index, cell in enumerate(cells)}
+        neighbors = tuple(
+            tuple(indices.get(cell + direction.to_vector(), -1) for direction in Direction)
+            for cell in cells
+        )
+        moves = tuple(
+            tuple((direction, neighbor) for direction, neighbor in zip(Direction, cell_neighbors) if neighbor >= 0)
+            for cell_neighbors in neighbors
+        )
+        slots = tuple(problem.slots.get(cell, -1) for cell in cells)
+        bits = max(1, (len(cells) - 1).bit_length())
+        car_slots = {index: position for position, index in problem.slots.items()}
+        goal = -1
+        if all(i in car_slots for i in range(len(problem.cars))):
+            goal = CompactParkingLayout.pack(bits, (indices[car_slots[i]] for i in range(len(problem.cars))))
+        return CompactParkingLayout(cells, indices, neighbors, moves, slots, bits, goal)
+
+    # Pack a sequence of cell indices (one per car) into a single integer
+    @staticmethod
+    def pack(bits: int, positions: Iterable[int]) -> int:
+        packed = 0
+        for i, position in enumerate(positions):
+            packed |= position << (i * bits)
+        return packed
+
+# The compact state contains the packed car positions and the bitmask of the occupied cells
+# Only the layout and the packed positions are compared and hashed since the occupied cells are derived from them
+# (like the compact sokoban state, the states of different layouts are never equal)
+# The property "cars" converts them back to points (the same as the normal parking state)
+@dataclass(eq=False, frozen=True)
+class CompactParkingState:
+    __slots__ = ("layout", "positions", "occupied")
+    layout: CompactParkingLayout
+    positions: int
+    occupied: int
+
+    # Returns the cell index of car 'i'
+    def car(self, i: int) -> int:
+        return self.positions >> (i * self.layout.bits) & ((1 << self.layout.bits) - 1)
+
+    @property
+    def cars(self) -> Tuple[Point, ...]:
+        count = bin(self.occupied).count("1")
+        return tuple(self.layout.cells[self.car(i)] for i in range(count))
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, CompactParkingState) and self.positions == other.positions and self.layout == other.layout
+
+    def __hash__(self) -> int:
+        return hash((self.layout, self.positions))
+
+    def __str__(self) -> str:
+        return str(tuple(str(car) for car in self.cars))
+
+# This is the parking problem using the compact state
+# It has the same actions (car index, direction), costs and goals as the parking problem
+# so it can be used with the same search functions
+class CompactParkingProblem(ParkingProblem):
+    compact_layout: CompactParkingLayout
+    initial_state: CompactParkingState
+    car_count: int
+
+    def get_initial_state(self) -> CompactParkingState:
+        return self.initial_state
+
+    def is_goal(self, state: CompactParkingState) -> bool:
+        return state.positions == self.compact_layout.goal
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: CompactParkingState) -> List[ParkingAction]:
+        moves, bits = self.compact_layout.moves, self.compact_layout.bits
+        mask = (1 << bits) - 1
+        positions, occupied = state.positions, state.occupied
+        actions = []
+        for i in range(self.car_count):
+            for direction, neighbor in moves[positions >> (i * bits) & mask]:
+                if not occupied >> neighbor & 1:
+                    actions.append((i, direction))
+        return actions
+
+    def get_successor(self, state: CompactParkingState, action: ParkingAction) -> CompactParkingState:
+        i, direction = action
+        shift = i * self.compact_layout.bits
+        car = state.car(i)
+        neighbor = self.compact_layout.neighbors[car][direction]
+        if neighbor < 0 or state.occupied >> neighbor & 1:
+            # If we try to move into a wall or another car, then this action is wrong
+            raise Exception(f"Invalid action {action} in state: {state}")
+        return CompactParkingState(
+            state.layout,
+            state.positions + ((neighbor - car) << shift),
+            state.occupied ^ (1 << car | 1 << neighbor)
+        )
+
+    def get_cost(self, state: CompactParkingState, action: ParkingAction) -> float:
+        i, direction = action
+        slot = self.compact_layout.slots[self.compact_layout.neighbors[state.car(i)][direction]]
+        return 26 - i + (100 if slot >= 0 and slot != i else 0)
+
+    # This is the same as ParkingProblem.iter_successors but it uses the packed positions and the neighbor table
+    def iter_successors(self, state: CompactParkingState) -> Iterator[Tuple[ParkingAction, CompactParkingState, float]]:
+        if self.successor_replaced():
+            yield from Problem.iter_successors(self, state)
+            return
+        layout = state.layout
+        cell_neighbors, slots, bits = layout.neighbors, layout.slots, layout.bits
+        mask = (1 << bits) - 1
+        positions, occupied = state.positions, state.occupied
+        for action in self.get_actions(state):
+            i, direction = action
+            shift = i * bits
+            car = positions >> shift & mask
+            neighbor = cell_neighbors[car][direction]
+            slot = slots[neighbor]
+            next_state = CompactParkingState(layout, positions + ((neighbor - car) << shift), occupied ^ (1 << car | 1 << neighbor))
+            yield action, next_state, 26 - i + (100 if slot >= 0 and slot != i else 0)
+
+    # Convert a parking problem to a compact parking problem
+    @staticmethod
+    def from_problem(problem: ParkingProblem) -> 'CompactParkingProblem':
+        compact_layout = CompactParkingLayout.from_problem(problem)
+        indices = compact_layout.indices
+        compact = CompactParkingProblem()
+        compact.passages = problem.passages
+        compact.cars = problem.cars
+        compact.slots = problem.slots
+        compact.width = problem.width
+        compact.height = problem.height
+        compact.compact_layout = compact_layout
+        compact.car_count = len(problem.cars)
+        compact.initial_state = CompactParkingState(
+            compact_layout,
+            CompactParkingLayout.pack(compact_layout.bits, (indices[car] for car in problem.cars)),
+            sum(1 << indices[car] for car in problem.cars)
+        )
+        return compact
+
+    # Read a compact parking problem from text containing a grid of tiles
+    @staticmethod
+    def from_text(text: str) -> 'CompactParkingProblem':
+        return CompactParkingProblem.from_problem(ParkingProblem.from_text(text))
+
+    # Read a compact parking problem from file containing a grid of tiles
+    @staticmethod
+    def from_file(path: str) -> 'CompactParkingProblem':
+        return CompactParkingProblem.from_problem(ParkingProblem.from_file(path))
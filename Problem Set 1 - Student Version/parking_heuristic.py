@@ -0,0 +1,57 @@
+from typing import Dict, List
+from collections import deque
+
+from parking import CompactParkingState, ParkingProblem, ParkingState
+from mathutils import Direction, Point
+
+# This file contains the heuristics of the parking problem
+
+# Returns the cache of the distance heuristic which contains:
+#   'distances': distances[i][position] is the number of moves needed by car 'i' to reach its slot from the position
+#                (ignoring the other cars). The positions that can not reach the slot are not in the dictionary.
+#   'weights': weights[i] is the cost of a single move of car 'i'
+#   'unreachable': the distance used for the positions that can not reach the slot (larger than any actual distance)
+#   'cell_distances': (only for the compact parking problem) the same distances indexed by the cell index
+def parking_heuristic_cache(problem: ParkingProblem) -> Dict:
+    cache = problem.cache()
+    if 'distances' not in cache:
+        unreachable = problem.width * problem.height
+        car_slots = {index: position for position, index in problem.slots.items()}
+        distances: List[Dict[Point, int]] = []
+        for i in range(len(problem.cars)):
+            # Run a BFS from the slot of the car over the passages (the moves are reversible so this gives the distance to the slot)
+            car_distances = {}
+            if i in car_slots:
+                car_distances[car_slots[i]] = 0
+                queue = deque([car_slots[i]])
+                while queue:
+                    position = queue.popleft()
+                    for direction in Direction:
+                        next_position = position + direction.to_vector()
+                        if next_position in problem.passages and next_position not in car_distances:
+                            car_distances[next_position] = car_distances[position] + 1
+                            queue.append(next_position)
+            distances.append(car_distances)
+        cache['distances'] = distances
+        cache['weights'] = [26 - i for i in range(len(problem.cars))]
+        cache['unreachable'] = unreachable
+        compact_layout = getattr(problem, "compact_layout", None)
+        if compact_layout is not None:
+            cache['cell_distances'] = [
+                [car_distances.get(cell, unreachable) for cell in compact_layout.cells]
+                for car_distances in distances
+            ]
+    return cache
+
+# This heuristic sums, for every car, the distance from the car to its slot (ignoring the other cars) multiplied by the cost of its moves
+# It is admissible since every car must make at least that many moves and every move of car 'i' costs at least 26 - i.
+# It is consistent since an action moves a single car 'i' by one cell which changes the heuristic by at most 26 - i
+# which is not more than the action cost.
+def parking_heuristic(problem: ParkingProblem, state: ParkingState) -> float:
+    cache = parking_heuristic_cache(problem)
+    weights = cache['weights']
+    if isinstance(state, CompactParkingState):
+        cell_distances = cache['cell_distances']
+        return sum(weights[i] * cell_distances[i][state.car(i)] for i in range(len(weights)))
+    distances, unreachable = cache['distances'], cache['unreachable']
+    return sum(weights[i] * distances[i].get(car, unreachable) for i, car in enumerate(state))
@@ -2,6 +2,7 @@ import time
 from graph import GraphRoutingProblem, GraphNode, graphrouting_heuristic
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
 from helpers.utils import fetch_recorded_calls
+from search_stats import SearchStats, with_stats
 import argparse, os, json
 
 # Create an agent based on the user selections
@@ -41,13 +42,21 @@ def create_agent(args: argparse.Namespace):
     if agent_type == "gbfs":
         from search import BestFirstSearch
         return InformedSearchAgent(BestFirstSearch, graphrouting_heuristic)
+    if agent_type == "biucs":
+        from search import BidirectionalUniformCostSearch
+        return UninformedSearchAgent(BidirectionalUniformCostSearch)
+    if agent_type == "biastar":
+        from search import BidirectionalAStarSearch
+        return InformedSearchAgent(BidirectionalAStarSearch, graphrouting_heuristic)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
 def main(args: argparse.Namespace):
     start = time.time() # Track run time
+    stats = SearchStats() # This will store the search statistics (they are only collected if requested by the user)
     graph_path = args.graph
-    problem = GraphRoutingProblem.from_file(graph_path) # create the problem
+    with stats.phase("load"):
+        problem = GraphRoutingProblem.from_file(graph_path) # create the problem
     # Check if there is a figure for the graph that we can display on the console
     figure_path = json.load(open(graph_path, 'r')).get("figure")
     figure = None
@@ -61,6 +70,9 @@ def main(args: argparse.Namespace):
         print(figure)
     print("Current Node:", state)
     agent = create_agent(args)
+    # If desired by the user, the search functions collect their statistics
+    if args.stats is not None and not isinstance(agent, HumanAgent):
+        agent.search_fn = with_stats(agent.search_fn, stats)
     step = 0 # This will store the current step
     path_cost = 0 # This will store the total path cost
     traversed_nodes = [] # This will store all the traversed nodes in order of traversal
@@ -94,14 +106,24 @@ def main(args: argparse.Namespace):
         print(f"Traversal Order: {'->'.join(traversed_nodes)}")
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
+    # If desired by the user, write the search statistics as JSON
+    if args.stats is not None and not isinstance(agent, HumanAgent):
+        record = {"graph": graph_path, "agent": args.agent, "solved": not unsolvable, "path_cost": path_cost, **stats.to_dict()}
+        if args.stats == "-":
+            print(json.dumps(record))
+        else:
+            with open(args.stats, "w") as file:
+                json.dump(record, file, indent=2)
 
 if __name__ == "__main__":
     # Read the arguments from the command line
     parser = argparse.ArgumentParser(description="Play Graph as Human or AI")
     parser.add_argument("graph", help="path to the graph to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'biucs', 'biastar'],
                         help="the agent that will play the game")
+    parser.add_argument("--stats", "-st", nargs="?", const="-", default=None,
+                        help="Write the search statistics as JSON to the given file (or print them if no file is given)")
 
     args = parser.parse_args()
     try:
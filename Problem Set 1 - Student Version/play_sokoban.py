@@ -1,10 +1,11 @@
 from typing import List
-from sokoban import SokobanProblem, Direction, SokobanState, SokobanTile
+from sokoban import SokobanProblem, CompactSokobanProblem, SokobanPushProblem, Direction, SokobanPruning, SokobanState, SokobanTile, push_level_search
 from agents import HumanAgent, UninformedSearchAgent, InformedSearchAgent
 from helpers.utils import fetch_tracked_call_count
 from helpers.heuristic_checks import test_heuristic_consistency
+from search_stats import SearchStats, with_stats
 from functools import lru_cache
-import argparse, time
+import argparse, json, time
 
 def colored_sokoban(level: str):
     from helpers.utils import bcolors
@@ -27,12 +28,26 @@ def get_heuristic(name: str):
     if name == "strong":
         from sokoban_heuristic import strong_heuristic
         return strong_heuristic
+    if name == "pdb":
+        from sokoban_heuristic import pdb_heuristic
+        return pdb_heuristic
     print(f"Requested Heuristic '{name}' is invalid")
     exit(-1)
 
+# The heuristics that never overestimate the number of pushes left. The other heuristics estimate the player steps
+# so they can overestimate the pushes and the push level search could miss the push-optimal solution with them
+PUSH_ADMISSIBLE_HEURISTICS = ("zero", "pdb")
+# The agents that rely on an admissible heuristic to bound the cost of their solution
+BOUNDED_AGENTS = ("astar", "idastar", "wastar", "arastar")
+
+# Return the problem class selected by the user
+def get_problem_class(args: argparse.Namespace):
+    return CompactSokobanProblem if args.compact else SokobanProblem
+
 # Create an agent based on the user selections
 def create_agent(args: argparse.Namespace):
     agent_type: str = args.agent
+    problem_class = get_problem_class(args)
     if agent_type == "human":
         # This function reads the action from the user (human)
         def sokoban_user_action(problem: SokobanProblem, state: SokobanState) -> Direction:
@@ -65,7 +80,7 @@ def create_agent(args: argparse.Namespace):
         heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+            problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
         return InformedSearchAgent(AStarSearch, heuristic)
     if agent_type == "gbfs":
         from search import BestFirstSearch
@@ -73,8 +88,33 @@ def create_agent(args: argparse.Namespace):
         heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
         # If desired by the user, we track every transition and check for the heuristic consistency for each transition
         if args.checks:
-            SokobanProblem.get_successor = test_heuristic_consistency(heuristic)(SokobanProblem.get_successor)
+            problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
         return InformedSearchAgent(BestFirstSearch, heuristic)
+    if agent_type == "idastar":
+        from search import IterativeDeepeningAStarSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        # If desired by the user, we track every transition and check for the heuristic consistency for each transition
+        if args.checks:
+            problem_class.get_successor = test_heuristic_consistency(heuristic)(problem_class.get_successor)
+        transposition_size = args.transposition
+        search_fn = lambda problem, state, heuristic, **kwargs: IterativeDeepeningAStarSearch(problem, state, heuristic, transposition_size, **kwargs)
+        return InformedSearchAgent(search_fn, heuristic)
+    if agent_type == "wastar":
+        from search import WeightedAStarSearch
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        epsilon = args.epsilon
+        search_fn = lambda problem, state, heuristic, **kwargs: WeightedAStarSearch(problem, state, heuristic, epsilon, **kwargs)
+        return InformedSearchAgent(search_fn, heuristic)
+    if agent_type == "arastar":
+        from search import AnytimeRepairingAStarSearch, LastSolution
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(args.heuristic))
+        epsilon, deadline = args.epsilon, args.deadline
+        # The agent follows the best solution found before the deadline
+        search_fn = lambda problem, state, heuristic, **kwargs: LastSolution(AnytimeRepairingAStarSearch(problem, state, heuristic, epsilon, deadline=deadline, **kwargs))
+        return InformedSearchAgent(search_fn, heuristic)
     print(f"Requested Agent '{agent_type}' is invalid")
     exit(-1)
 
@@ -82,16 +122,29 @@ def main(args: argparse.Namespace):
     state_printer = lambda state: print(state)
     if args.ansicolors: state_printer = lambda state: print(colored_sokoban(str(state)))
     start = time.time() # Track run time
-    problem = SokobanProblem.from_file(args.level) # create the problem
+    stats = SearchStats() # This will store the search statistics (they are only collected if requested by the user)
+    problem_class = get_problem_class(args)
+    with stats.phase("load"):
+        problem = problem_class.from_file(args.level) # create the problem
+    problem.pruning = SokobanPruning(args.pruning) # set the deadlock pruning mode
     state = problem.get_initial_state() # Get the initial state
     print("Initial State:")
     state_printer(state)
     agent = create_agent(args)
+    # If desired by the user, the search agents search over the crate pushes instead of the player steps
+    # In this case, the explored nodes are counted on the push level problem
+    tracked_class = problem_class
+    if args.push and not isinstance(agent, HumanAgent):
+        agent.search_fn = push_level_search(agent.search_fn)
+        tracked_class = SokobanPushProblem
+    # If desired by the user, the search functions collect their statistics
+    if args.stats is not None and not isinstance(agent, HumanAgent):
+        agent.search_fn = with_stats(agent.search_fn, stats)
     step = 0 # This will store the current step
     total_explored_nodes = 0 # This will store the number of traversed nodes during search
     unsolvable = False # This will store whether the problem is unsolvable or not
     while not problem.is_goal(state):
-        fetch_tracked_call_count(SokobanProblem.is_goal) # Clear the call counter
+        fetch_tracked_call_count(tracked_class.get_actions) # Clear the call counter
         action = agent.act(problem, state) # Request an action from the agent
         # If no solution was found, break
         if action is None:
@@ -99,7 +152,7 @@ def main(args: argparse.Namespace):
             unsolvable = True
             break
         # Get the number of traversed nodes
-        total_explored_nodes += fetch_tracked_call_count(SokobanProblem.is_goal)
+        total_explored_nodes += fetch_tracked_call_count(tracked_class.get_actions)
         # Apply the action to the state
         state = problem.get_successor(state, action)
         step += 1
@@ -119,6 +172,14 @@ def main(args: argparse.Namespace):
         print(f"Search explored {total_explored_nodes} nodes")
     # Finally print the elapsed time for the whole process
     print(f"Elapsed time: {time.time() - start} seconds")
+    # If desired by the user, write the search statistics as JSON
+    if args.stats is not None and not isinstance(agent, HumanAgent):
+        record = {"level": args.level, "agent": args.agent, "heuristic": args.heuristic, "solved": not unsolvable, "steps": step, **stats.to_dict()}
+        if args.stats == "-":
+            print(json.dumps(record))
+        else:
+            with open(args.stats, "w") as file:
+                json.dump(record, file, indent=2)
 
 
 if __name__ == "__main__":
@@ -126,17 +187,35 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Play Sokoban as Human or AI")
     parser.add_argument("level", help="path to the sokoban level to play")
     parser.add_argument("--agent", "-a", default="human",
-                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs'],
+                        choices=['human', 'bfs', 'dfs', 'ucs', 'astar', 'gbfs', 'idastar', 'wastar', 'arastar'],
                         help="the agent that will play the game")
     parser.add_argument("--heuristic", '-hf', default="zero",
-                        choices=["zero", "weak", "strong"],
-                        help="choose the heuristic to use with A* or Greedy Best First Search")
+                        choices=["zero", "weak", "strong", "pdb"],
+                        help="choose the heuristic to use with A*, IDA*, weighted A*, ARA* or Greedy Best First Search")
+    parser.add_argument("--epsilon", "-e", type=float, default=2.0,
+                        help="the heuristic weight of weighted A* and the initial weight of ARA*")
+    parser.add_argument("--deadline", "-d", type=float, default=None,
+                        help="the time limit in seconds of ARA* (it returns the best solution found before the deadline)")
+    parser.add_argument("--transposition", "-tt", type=int, default=0,
+                        help="the maximum number of states in the transposition table of IDA* (0 disables it)")
+    parser.add_argument("--compact", "-cp", action="store_true", default=False,
+                        help="Use the compact (integer indexed) sokoban state")
+    parser.add_argument("--push", "-pu", action="store_true", default=False,
+                        help="Search over the crate pushes instead of the player steps (the solution is push-optimal, not step-optimal: "
+                             "it minimizes the pushes and can take more player steps; only the zero and pdb heuristics are allowed with A*, IDA*, weighted A* and ARA*)")
+    parser.add_argument("--pruning", "-p", default="none",
+                        choices=[pruning.value for pruning in SokobanPruning],
+                        help="Prune the pushes that lead to deadlocks (dead: dead squares, freeze: dead squares and frozen crates)")
     parser.add_argument("--checks", "-c", action='store_true', default=False,
                         help="Enable consistency checks for the heuristic")
+    parser.add_argument("--stats", "-st", nargs="?", const="-", default=None,
+                        help="Write the search statistics as JSON to the given file (or print them if no file is given)")
     parser.add_argument("--ansicolors", "-ac", action="store_true",
                         help="Print the level on the console with ANSI colors (only works on some terminals)")
 
     args = parser.parse_args()
+    if args.push and args.agent in BOUNDED_AGENTS and args.heuristic not in PUSH_ADMISSIBLE_HEURISTICS:
+        parser.error(f"the {args.heuristic} heuristic is not admissible for the pushes, use one of {', '.join(PUSH_ADMISSIBLE_HEURISTICS)} with --push")
     try:
         main(args)
     except KeyboardInterrupt:
@@ -0,0 +1,298 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from dataclasses import dataclass
+from collections import deque
+from enum import Enum
+from functools import lru_cache
+from multiprocessing import connection
+import argparse, multiprocessing, os, time
+
+from helpers.utils import fetch_recorded_calls, fetch_tracked_call_count
+
+# This file contains the portfolio solver which runs several search strategies in parallel (one process per strategy)
+# and returns the first solution found or the solution with the least cost found before a deadline
+# The strategies that are still running when the portfolio is done are cancelled (their processes are terminated)
+
+# The agents that do not use a heuristic
+UNINFORMED_AGENTS = ("bfs", "dfs", "ucs")
+
+# A strategy is a search algorithm and the heuristic it uses
+# The weight is only used by weighted A* (it is the epsilon of the search)
+@dataclass(frozen=True)
+class Strategy:
+    agent: str
+    heuristic: str = "zero"
+    weight: float = 1.0
+
+    def __str__(self) -> str:
+        if self.agent in UNINFORMED_AGENTS:
+            return self.agent
+        if self.agent == "wastar":
+            return f"{self.agent}:{self.heuristic}:{self.weight:g}"
+        return f"{self.agent}:{self.heuristic}"
+
+    # Parse a strategy written as "agent", "agent:heuristic" or "agent:heuristic:weight" (as printed by __str__)
+    @staticmethod
+    def parse(text: str) -> 'Strategy':
+        agent, *rest = text.split(":")
+        heuristic = rest[0] if rest else "zero"
+        return Strategy(agent, heuristic, float(rest[1]) if len(rest) > 1 else 1.0)
+
+# The portfolio either stops at the first solution or waits for all the strategies (or the deadline) and keeps the cheapest solution
+class PortfolioMode(str, Enum):
+    FIRST = "first"
+    BEST  = "best"
+
+class StrategyStatus(str, Enum):
+    SOLVED    = "solved"     # The strategy found a solution
+    FAILED    = "failed"     # The strategy finished without finding a solution
+    CANCELLED = "cancelled"  # The strategy was still running when the portfolio finished
+    ERROR     = "error"      # The strategy raised an exception (or its process died)
+
+# This is the outcome of a single strategy
+# The explored nodes are the calls of the tracked "get_actions" of the problem (only known for the strategies that finished)
+@dataclass
+class StrategyResult:
+    strategy: Strategy
+    status: StrategyStatus
+    solution: Optional[List[Any]] = None
+    cost: Optional[float] = None
+    explored: Optional[int] = None
+    elapsed: Optional[float] = None
+    error: Optional[str] = None
+
+# The default strategies for each domain
+DEFAULT_STRATEGIES: Dict[str, List[Strategy]] = {
+    "sokoban": [
+        Strategy("astar", "strong"),
+        Strategy("astar", "pdb"),
+        Strategy("gbfs", "strong"),
+        Strategy("idastar", "strong"),
+        Strategy("wastar", "strong", 2.0),
+    ],
+    "graph": [
+        Strategy("astar", "euclidean"),
+        Strategy("gbfs", "euclidean"),
+        Strategy("wastar", "euclidean", 2.0),
+    ],
+    "parking": [
+        Strategy("astar", "distance"),
+        Strategy("ucs"),
+    ],
+}
+
+# Returns the domain of a problem file from its extension (the graphs are json files and the sokoban levels are text files)
+def domain_of(path: str) -> str:
+    return "graph" if path.endswith(".json") else "sokoban"
+
+# Return the search function of the strategy with the heuristic already bound to it
+def strategy_search_function(strategy: Strategy, heuristic: Callable, transposition_size: int = 0) -> Callable:
+    import search
+    if strategy.agent == "bfs":
+        return search.BreadthFirstSearch
+    if strategy.agent == "dfs":
+        return search.DepthFirstSearch
+    if strategy.agent == "ucs":
+        return search.UniformCostSearch
+    if strategy.agent == "astar":
+        return lambda problem, state: search.AStarSearch(problem, state, heuristic)
+    if strategy.agent == "gbfs":
+        return lambda problem, state: search.BestFirstSearch(problem, state, heuristic)
+    if strategy.agent == "idastar":
+        return lambda problem, state: search.IterativeDeepeningAStarSearch(problem, state, heuristic, transposition_size)
+    if strategy.agent == "wastar":
+        weight = strategy.weight
+        return lambda problem, state: search.WeightedAStarSearch(problem, state, heuristic, weight)
+    raise ValueError(f"Requested Agent '{strategy.agent}' is invalid")
+
+# Load the problem of the given domain and return (the problem, the search function, a function that returns the explored nodes)
+def load_strategy(domain: str, path: str, strategy: Strategy, options: Dict[str, Any]) -> Tuple[Any, Callable, Callable[[], int]]:
+    if domain == "sokoban":
+        from sokoban import SokobanProblem, CompactSokobanProblem, SokobanPushProblem, SokobanPruning, push_level_search
+        from play_sokoban import BOUNDED_AGENTS, PUSH_ADMISSIBLE_HEURISTICS, get_heuristic
+        # The push level solutions are push-optimal, so the bounded agents need a heuristic that does not overestimate the pushes
+        if options.get("push") and strategy.agent in BOUNDED_AGENTS and strategy.heuristic not in PUSH_ADMISSIBLE_HEURISTICS:
+            raise ValueError(f"The {strategy.heuristic} heuristic is not admissible for the pushes")
+        problem_class = CompactSokobanProblem if options.get("compact") else SokobanProblem
+        problem = problem_class.from_file(path)
+        problem.pruning = SokobanPruning(options.get("pruning", "none"))
+        # We cache the heuristic calls to speed up the search process if the heuristic is not fast
+        heuristic = lru_cache(2**16)(get_heuristic(strategy.heuristic))
+        search_fn = strategy_search_function(strategy, heuristic, options.get("transposition", 0))
+        # When searching over the pushes, the explored nodes are counted on the push level problem
+        tracked_class = problem_class
+        if options.get("push"):
+            search_fn = push_level_search(search_fn)
+            tracked_class = SokobanPushProblem
+        fetch_tracked_call_count(tracked_class.get_actions) # Clear the call counter
+        return problem, search_fn, lambda: fetch_tracked_call_count(tracked_class.get_actions)
+    if domain == "graph":
+        from graph import GraphRoutingProblem, graphrouting_heuristic
+        problem = GraphRoutingProblem.from_file(path)
+        heuristics = {"zero": lambda *_: 0, "euclidean": graphrouting_heuristic}
+        if strategy.heuristic not in heuristics:
+            raise ValueError(f"Requested Heuristic '{strategy.heuristic}' is invalid")
+        search_fn = strategy_search_function(strategy, heuristics[strategy.heuristic], options.get("transposition", 0))
+        # The graph routing problem records the calls of "get_actions" instead of counting them
+        fetch_recorded_calls(GraphRoutingProblem.get_actions) # Clear the recorded calls
+        return problem, search_fn, lambda: len(fetch_recorded_calls(GraphRoutingProblem.get_actions))
+    if domain == "parking":
+        from parking import ParkingProblem, CompactParkingProblem
+        problem_class = CompactParkingProblem if options.get("compact") else ParkingProblem
+        from parking_heuristic import parking_heuristic
+        problem = problem_class.from_file(path)
+        heuristics = {"zero": lambda *_: 0, "distance": parking_heuristic}
+        if strategy.heuristic not in heuristics:
+            raise ValueError(f"Requested Heuristic '{strategy.heuristic}' is invalid")
+        search_fn = strategy_search_function(strategy, heuristics[strategy.heuristic], options.get("transposition", 0))
+        fetch_tracked_call_count(problem_class.get_actions) # Clear the call counter
+        return problem, search_fn, lambda: fetch_tracked_call_count(problem_class.get_actions)
+    raise ValueError(f"Unknown domain '{domain}'")
+
+# Returns the action as text, the parking actions (car index, direction) are written as the car letter followed by the direction
+def format_action(action: Any) -> str:
+    if isinstance(action, tuple):
+        index, direction = action
+        return f"{chr(ord('A') + index)}{direction}"
+    return str(action)
+
+# Run a single strategy on the problem file. This function runs in the worker processes
+# so the problem is loaded from the file in the worker instead of being sent from the parent process
+def run_strategy(domain: str, path: str, strategy: Strategy, options: Dict[str, Any]) -> StrategyResult:
+    problem, search_fn, fetch_explored = load_strategy(domain, path, strategy, options)
+    state = problem.get_initial_state()
+    start = time.perf_counter()
+    solution = search_fn(problem, state)
+    elapsed = time.perf_counter() - start
+    explored = fetch_explored()
+    if solution is None:
+        return StrategyResult(strategy, StrategyStatus.FAILED, explored=explored, elapsed=elapsed)
+    cost = 0
+    for action in solution:
+        cost += problem.get_cost(state, action)
+        state = problem.get_successor(state, action)
+    return StrategyResult(strategy, StrategyStatus.SOLVED, list(solution), cost, explored, elapsed)
+
+# The main function of a strategy process: run the strategy and send back its result (or the error it raised)
+def strategy_main(pipe: connection.Connection, domain: str, path: str, strategy: Strategy, options: Dict[str, Any]) -> None:
+    try:
+        result = run_strategy(domain, path, strategy, options)
+    except Exception as error:
+        result = StrategyResult(strategy, StrategyStatus.ERROR, error=repr(error))
+    pipe.send(result)
+
+# A process running a single strategy with the pipe used to receive its result
+class StrategyProcess:
+    __slots__ = ("strategy", "process", "pipe")
+
+    def __init__(self, domain: str, path: str, strategy: Strategy, options: Dict[str, Any]) -> None:
+        self.strategy = strategy
+        self.pipe, child_pipe = multiprocessing.Pipe(duplex=False)
+        self.process = multiprocessing.Process(target=strategy_main, args=(child_pipe, domain, path, strategy, options), daemon=True)
+        self.process.start()
+        child_pipe.close()
+
+    # Terminate the process if it is still running (used when the portfolio is done before the strategy)
+    def stop(self) -> None:
+        if self.process.is_alive():
+            self.process.terminate()
+        self.process.join()
+        self.pipe.close()
+
+# Run the strategies in parallel on the problem file
+# Returns the selected result (None if no strategy found a solution) and the result of every strategy (in the given order)
+# In the FIRST mode, the first solution is returned as soon as it is found
+# In the BEST mode, the cheapest solution is returned after all the strategies finish or after the deadline (in seconds)
+def solve_portfolio(path: str, strategies: List[Strategy], mode: PortfolioMode = PortfolioMode.FIRST,
+                    deadline: Optional[float] = None, workers: Optional[int] = None,
+                    options: Optional[Dict[str, Any]] = None, domain: Optional[str] = None) -> Tuple[Optional[StrategyResult], List[StrategyResult]]:
+    domain = domain or domain_of(path)
+    options = options or {}
+    end = None if deadline is None else time.monotonic() + deadline
+    results: Dict[Strategy, StrategyResult] = {}
+    best: Optional[StrategyResult] = None
+    # Every strategy runs in its own process, and at most "workers" strategies run at the same time
+    waiting = deque(strategies)
+    running: List[StrategyProcess] = []
+    workers = workers or min(len(strategies), os.cpu_count() or 1)
+    try:
+        while waiting or running:
+            while waiting and len(running) < workers:
+                running.append(StrategyProcess(domain, path, waiting.popleft(), options))
+            timeout = None if end is None else max(0.0, end - time.monotonic())
+            # A pipe becomes ready when the strategy sends its result or when its process dies (end of file)
+            ready = connection.wait([process.pipe for process in running], timeout)
+            if not ready: break # The deadline has passed
+            for process in [process for process in running if process.pipe in ready]:
+                try:
+                    result = process.pipe.recv()
+                except (EOFError, OSError):
+                    process.process.join()
+                    result = StrategyResult(process.strategy, StrategyStatus.ERROR, error=f"the process exited with code {process.process.exitcode}")
+                running.remove(process)
+                process.stop()
+                results[process.strategy] = result
+                if result.status == StrategyStatus.SOLVED and (best is None or result.cost < best.cost):
+                    best = result
+            if mode == PortfolioMode.FIRST and best is not None: break
+    finally:
+        for process in running:
+            process.stop()
+    ordered = [results.get(strategy) or StrategyResult(strategy, StrategyStatus.CANCELLED) for strategy in strategies]
+    return best, ordered
+
+def main(args: argparse.Namespace):
+    domain = args.domain or domain_of(args.problem)
+    strategies = [Strategy.parse(text) for text in args.strategies] if args.strategies else DEFAULT_STRATEGIES[domain]
+    options = {
+        "compact": args.compact,
+        "push": args.push,
+        "pruning": args.pruning,
+        "transposition": args.transposition,
+    }
+    start = time.time() # Track run time
+    best, results = solve_portfolio(args.problem, strategies, PortfolioMode(args.mode), args.deadline, args.workers, options, domain)
+    for result in results:
+        line = f"{str(result.strategy):24} {result.status.value:10}"
+        if result.cost is not None: line += f" cost = {result.cost:g}"
+        if result.explored is not None: line += f", explored = {result.explored} nodes"
+        if result.elapsed is not None: line += f", time = {result.elapsed:.3f} sec"
+        if result.error is not None: line += f" {result.error}"
+        print(line)
+    if best is None:
+        print("No strategy found a solution")
+    else:
+        print(f"Selected {best.strategy} with cost {best.cost:g}")
+        print("Solution:", " ".join(format_action(action) for action in best.solution))
+    # Finally print the elapsed time for the whole process
+    print(f"Elapsed time: {time.time() - start} seconds")
+
+if __name__ == "__main__":
+    # Read the arguments from the command line
+    parser = argparse.ArgumentParser(description="Solve a sokoban level or a graph with a portfolio of search strategies running in parallel")
+    parser.add_argument("problem", help="path to the sokoban level (.txt) or the graph (.json) to solve")
+    parser.add_argument("--domain", "-dm", default=None, choices=list(DEFAULT_STRATEGIES),
+                        help="the problem domain (default: graph for .json files and sokoban otherwise)")
+    parser.add_argument("--strategies", "-s", nargs="+",
+                        help="the strategies written as agent:heuristic or wastar:heuristic:weight "
+                             "(agents: bfs, dfs, ucs, astar, gbfs, idastar, wastar) (default: a portfolio for the problem domain)")
+    parser.add_argument("--mode", "-m", default=PortfolioMode.FIRST.value,
+                        choices=[mode.value for mode in PortfolioMode],
+                        help="return the first solution or the cheapest solution found before the deadline")
+    parser.add_argument("--deadline", "-d", type=float, default=None,
+                        help="the maximum time in seconds to wait for the strategies")
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="the number of worker processes (default: one per strategy up to the number of CPUs)")
+    parser.add_argument("--transposition", "-tt", type=int, default=0,
+                        help="the maximum number of states in the transposition table of IDA* (0 disables it)")
+    parser.add_argument("--compact", "-cp", action="store_true", default=False,
+                        help="Use the compact (integer indexed) sokoban or parking state")
+    parser.add_argument("--push", "-pu", action="store_true", default=False,
+                        help="Search over the crate pushes instead of the player steps")
+    parser.add_argument("--pruning", "-p", default="none", choices=["none", "dead", "freeze"],
+                        help="Prune the pushes that lead to deadlocks")
+
+    args = parser.parse_args()
+    try:
+        main(args)
+    except KeyboardInterrupt:
+        print("Goodbye!!")
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Callable, Generic, Iterable, List, TypeVar, Union
+from typing import Callable, Generic, Iterable, Iterator, List, Tuple, TypeVar, Union
 from helpers.utils import CacheContainer, with_cache
 
 # S and A are used for generic typing where S represents the state type and A represents the action type
@@ -10,6 +10,12 @@ A = TypeVar("A")
 # It also implements 'CacheContainer' which allows you to call the "cache" method
 # which returns a dictionary in which you can store any data you want to cache
 class Problem(ABC, Generic[S, A], CacheContainer):
+    # Remember the get_successor of every problem class when it is defined, so we can detect if it was replaced later
+    # (for example, to check the heuristic consistency on every transition)
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        cls._defined_get_successor = cls.get_successor
+
     # This function returns the initial state
     @abstractmethod
     def get_initial_state(self) -> S:
@@ -34,6 +40,20 @@ class Problem(ABC, Generic[S, A], CacheContainer):
     def get_cost(self, state: S, action: A) -> float:
         return 1.0
 
+    # This function generates the successors of the given state as tuples (action, next state, action cost)
+    # The search functions use it instead of calling get_successor and get_cost for every action.
+    # Problems can override it to build the successors in a single pass (the actions returned by get_actions are
+    # already valid so there is no need to check them again). The overrides should still call get_actions once
+    # so the explored nodes are still tracked, and should fall back to this implementation if successor_replaced() is True
+    def iter_successors(self, state: S) -> Iterator[Tuple[A, S, float]]:
+        for action in self.get_actions(state):
+            yield action, self.get_successor(state, action), self.get_cost(state, action)
+
+    # Returns True if get_successor was replaced after the problem class was defined
+    def successor_replaced(self) -> bool:
+        cls = type(self)
+        return cls.get_successor is not cls._defined_get_successor
+
 # These are type aliases for:
 # A solution which is a list of actions (or None if no solution is found)
 Solution = Union[List[A], None]
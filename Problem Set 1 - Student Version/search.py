@@ -1,9 +1,11 @@
 from problem import HeuristicFunction, Problem, S, A, Solution
-from collections import deque
+from collections import OrderedDict, deque
 from helpers.utils import NotImplemented
 
-from queue import PriorityQueue
-from typing import List
+from frontier import PriorityFrontier
+from search_stats import SearchStats
+from typing import Callable, Generic, Iterator, List, Optional
+import math, time
 
 # All search functions take a problem and a state
 # If it is an informed search function, it will also receive a heuristic function
@@ -13,123 +15,409 @@ from typing import List
 # 1. A list of actions which represent the path from the initial state to the final state
 # 2. None if there is no solution
 
-def BreadthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
+# The successors are generated with problem.iter_successors (see problem.py) which returns the action, the next state
+# and the action cost together, so the problems can generate them in a single pass
+# All the search functions also accept an optional SearchStats (see search_stats.py) which they fill with
+# the number of expanded, generated and duplicate nodes, the peak frontier and visited sizes and the heuristic calls
+
+# A search node stores a state along with a pointer to its parent node and the action that generated it
+# Instead of copying the action list into every generated node (which costs O(depth) per node),
+# the path is only reconstructed by following the parent pointers once a goal is found
+class SearchNode(Generic[S, A]):
+    __slots__ = ("state", "parent", "action")
+
+    def __init__(self, state: S, parent: Optional['SearchNode[S, A]'] = None, action: Optional[A] = None):
+        self.state = state
+        self.parent = parent
+        self.action = action
+
+    # Returns the list of actions from the root node to this node
+    def path(self) -> List[A]:
+        actions = []
+        node = self
+        while node.parent is not None:
+            actions.append(node.action)
+            node = node.parent
+        actions.reverse()
+        return actions
+
+def BreadthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
     queue = deque()
-    actions = []
     visited = set()
-    queue.append((initial_state, actions))
+    queue.append(SearchNode(initial_state))
     while queue:
-        state, actions = queue.popleft()
+        node = queue.popleft()
+        state = node.state
         if problem.is_goal(state):
-            return actions
+            return node.path()
         if state in visited:
+            if stats is not None: stats.duplicates += 1
             continue
         visited.add(state)
-        for action in problem.get_actions(state):
-            new_state = problem.get_successor(state, action)
-            new_actions = actions + [action]
+        if stats is not None: stats.expand(len(queue), len(visited))
+        for action, new_state, _ in problem.iter_successors(state):
+            if stats is not None: stats.generated += 1
+            new_node = SearchNode(new_state, node, action)
             if problem.is_goal(new_state):
-                return new_actions
+                return new_node.path()
             if new_state not in visited:
-                queue.append((new_state, new_actions))
+                queue.append(new_node)
+            elif stats is not None:
+                stats.duplicates += 1
     return None
 
-def DFSUtil(problem: Problem[S, A], state: S, visited: set, actions: List[A]) -> Solution:
-    if problem.is_goal(state):
-        return actions
-    if state in visited:
-        return None
-    visited.add(state)
-    for action in problem.get_actions(state):
-        new_state = problem.get_successor(state, action)
-        new_actions = actions + [action]
-        result = DFSUtil(problem, new_state, visited, new_actions)
-        if result is not None:
-            return result
+# The depth first search uses an explicit stack instead of recursion so it is not limited by the recursion limit
+# Each stack entry holds a node and an iterator over its remaining successors, so the successors are generated
+# lazily one at a time which gives the exact same expansion order as the recursive implementation
+def DepthFirstSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    root = SearchNode(initial_state)
+    if problem.is_goal(initial_state):
+        return root.path()
+    visited = {initial_state}
+    if stats is not None: stats.expand(0, len(visited))
+    stack = [(root, problem.iter_successors(initial_state))]
+    done = object() # A sentinel to detect when a node has no remaining successors
+    while stack:
+        node, successors = stack[-1]
+        successor = next(successors, done)
+        if successor is done:
+            stack.pop()
+            continue
+        action, new_state, _ = successor
+        if stats is not None: stats.generated += 1
+        new_node = SearchNode(new_state, node, action)
+        if problem.is_goal(new_state):
+            return new_node.path()
+        if new_state in visited:
+            if stats is not None: stats.duplicates += 1
+            continue
+        visited.add(new_state)
+        if stats is not None: stats.expand(len(stack), len(visited))
+        stack.append((new_node, problem.iter_successors(new_state)))
     return None
 
-def DepthFirstSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-    return DFSUtil(problem, initial_state, set(), [])
-    
+# Some heuristics can evaluate a successor faster if they know its parent (for example, by reusing work done for the parent)
+# Such heuristics have an "incremental" attribute which is a function of (problem, state, parent_state)
+# This returns a function with that signature for any heuristic, so the search functions can always pass the parent
+def SuccessorHeuristic(heuristic: HeuristicFunction) -> Callable[[Problem[S, A], S, S], float]:
+    incremental = getattr(heuristic, "incremental", None)
+    if incremental is not None:
+        return incremental
+    return lambda problem, state, parent_state: heuristic(problem, state)
 
-class PQItem:
-    def __init__(self, cost: float, state: S, actions: List[A], time: int):
-        self.cost = cost
-        self.state = state
-        self.actions = actions
-        self.time = time
-
-    def __lt__(self, other):
-        if self.cost == other.cost:
-            return self.time < other.time
-        return self.cost < other.cost
-
-def UniformCostSearch(problem: Problem[S, A], initial_state: S) -> Solution:
-    pq = PriorityQueue()
-    time = 0
-    pq.put(PQItem(0, initial_state, [], time))
-    time += 1
+def UniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    frontier = PriorityFrontier()
+    frontier.push(0, SearchNode(initial_state))
     visited = dict()
-    while not pq.empty():
-        item = pq.get()
-        cost, state, actions = item.cost, item.state, item.actions
+    while frontier:
+        cost, node = frontier.pop()
+        state = node.state
         if state in visited and visited[state] <= cost:
+            if stats is not None: stats.duplicates += 1
             continue
         if problem.is_goal(state):
-            return actions
+            return node.path()
         visited[state] = cost
-        for action in problem.get_actions(state):
-            new_state = problem.get_successor(state, action)
-            new_actions = actions + [action]
-            new_cost = cost + problem.get_cost(state, action)
+        if stats is not None: stats.expand(len(frontier), len(visited))
+        for action, new_state, action_cost in problem.iter_successors(state):
+            new_cost = cost + action_cost
+            if stats is not None: stats.generated += 1
             if new_state not in visited or visited[new_state] > new_cost:
-                pq.put(PQItem(new_cost, new_state, new_actions, time))
-                time += 1
+                frontier.push(new_cost, SearchNode(new_state, node, action))
+            elif stats is not None:
+                stats.duplicates += 1
     return None
 
-def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
-    pq = PriorityQueue()
-    time = 0
-    pq.put(PQItem(0, initial_state, [], time))
-    time += 1
+def AStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    successor_heuristic = SuccessorHeuristic(heuristic)
+    frontier = PriorityFrontier()
+    frontier.push(0, SearchNode(initial_state))
     visited = dict()
-    while not pq.empty():
-        item = pq.get()
-        cost, state, actions = item.cost, item.state, item.actions
+    while frontier:
+        cost, node = frontier.pop()
+        state = node.state
         if state in visited and visited[state] <= cost:
+            if stats is not None: stats.duplicates += 1
             continue
         if problem.is_goal(state):
-            return actions
+            return node.path()
         visited[state] = cost
+        if stats is not None: stats.expand(len(frontier), len(visited))
         cur_heuristic = heuristic(problem, state)
-        for action in problem.get_actions(state):
-            new_state = problem.get_successor(state, action)
-            new_actions = actions + [action]
-            new_cost = cost + problem.get_cost(state, action) + heuristic(problem, new_state) - cur_heuristic
+        for action, new_state, action_cost in problem.iter_successors(state):
+            new_cost = cost + action_cost + successor_heuristic(problem, new_state, state) - cur_heuristic
+            if stats is not None: stats.generated += 1
             if new_state not in visited or visited[new_state] > new_cost:
-                pq.put(PQItem(new_cost, new_state, new_actions, time))
-                time += 1
+                frontier.push(new_cost, SearchNode(new_state, node, action))
+            elif stats is not None:
+                stats.duplicates += 1
     return None
 
-def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction) -> Solution:
-    pq = PriorityQueue()
-    time = 0
-    pq.put(PQItem(0, initial_state, [], time))
-    time += 1
+def BestFirstSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    successor_heuristic = SuccessorHeuristic(heuristic)
+    frontier = PriorityFrontier()
+    frontier.push(0, SearchNode(initial_state))
     visited = dict()
-    while not pq.empty():
-        item = pq.get()
-        cost, state, actions = item.cost, item.state, item.actions
+    while frontier:
+        cost, node = frontier.pop()
+        state = node.state
         if state in visited and visited[state] <= cost:
+            if stats is not None: stats.duplicates += 1
             continue
         if problem.is_goal(state):
-            return actions
+            return node.path()
         visited[state] = cost
-        for action in reversed(problem.get_actions(state)):
-            new_state = problem.get_successor(state, action)
-            new_actions = actions + [action]
-            new_cost = heuristic(problem, new_state)
+        if stats is not None: stats.expand(len(frontier), len(visited))
+        for action, new_state, _ in reversed(list(problem.iter_successors(state))):
+            new_cost = successor_heuristic(problem, new_state, state)
+            if stats is not None: stats.generated += 1
             if new_state not in visited or visited[new_state] > new_cost:
-                pq.put(PQItem(new_cost, new_state, new_actions, time))
-                time += 1
-    return None
\ No newline at end of file
+                frontier.push(new_cost, SearchNode(new_state, node, action))
+            elif stats is not None:
+                stats.duplicates += 1
+    return None
+
+# Weighted A* orders the frontier by f = g + epsilon * h. With epsilon > 1, the search is greedier so it usually expands
+# far fewer nodes, and if the heuristic is consistent, the cost of the returned solution is at most epsilon * the optimal cost
+# With epsilon = 1, this is the same as A*
+def WeightedAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, epsilon: float = 1.0,
+                        stats: Optional[SearchStats] = None) -> Solution:
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    successor_heuristic = SuccessorHeuristic(heuristic)
+    frontier = PriorityFrontier()
+    frontier.push(epsilon * heuristic(problem, initial_state), (0, SearchNode(initial_state)))
+    visited = dict()
+    while frontier:
+        _, (cost, node) = frontier.pop()
+        state = node.state
+        if state in visited and visited[state] <= cost:
+            if stats is not None: stats.duplicates += 1
+            continue
+        if problem.is_goal(state):
+            return node.path()
+        visited[state] = cost
+        if stats is not None: stats.expand(len(frontier), len(visited))
+        for action, new_state, action_cost in problem.iter_successors(state):
+            new_cost = cost + action_cost
+            if stats is not None: stats.generated += 1
+            if new_state not in visited or visited[new_state] > new_cost:
+                priority = new_cost + epsilon * successor_heuristic(problem, new_state, state)
+                frontier.push(priority, (new_cost, SearchNode(new_state, node, action)))
+            elif stats is not None:
+                stats.duplicates += 1
+    return None
+
+# Anytime Repairing A* (ARA*) runs a series of weighted A* searches starting with the given epsilon
+# and decreasing it by the decrement after each search until it reaches 1.
+# Each solution is yielded as soon as it is found, and each one is cheaper than the previous one
+# (once the search with a given epsilon finishes, the last solution costs at most epsilon * the optimal cost
+# if the heuristic is consistent), so the last one is optimal.
+# Instead of starting from scratch, each search reuses the costs of the previous one:
+# a state is expanded at most once per search and the states whose cost decreased after their expansion
+# are kept aside (as inconsistent) and added to the frontier of the next search.
+# If a deadline (in seconds) is given, the generator stops once it has passed. Since every cheaper solution is yielded
+# before the deadline is checked again, the best solution found before the deadline is never lost.
+def AnytimeRepairingAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction,
+                                epsilon: float = 3.0, decrement: float = 0.5, deadline: Optional[float] = None,
+                                stats: Optional[SearchStats] = None) -> Iterator[Solution]:
+    if problem.is_goal(initial_state):
+        yield []
+        return
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    successor_heuristic = SuccessorHeuristic(heuristic)
+    end = None if deadline is None else time.monotonic() + deadline
+    costs = {initial_state: 0}
+    heuristics = {initial_state: heuristic(problem, initial_state)}
+    parents = {initial_state: None} # the parent state and the action of the cheapest known path to every state
+    open_states = {initial_state}
+    inconsistent = set()
+    goal_cost = math.inf
+    while open_states:
+        frontier = PriorityFrontier()
+        for state in open_states:
+            frontier.push(costs[state] + epsilon * heuristics[state], (costs[state], state))
+        closed = set()
+        while frontier:
+            priority, (cost, state) = frontier.pop()
+            # Skip the stale entries (the state was expanded or reached with a lower cost after this entry was pushed)
+            if state not in open_states or cost != costs[state]:
+                if stats is not None: stats.duplicates += 1
+                continue
+            # Stop once no state in the frontier can lead to a cheaper solution with the current epsilon
+            if priority >= goal_cost:
+                break
+            if end is not None and time.monotonic() >= end:
+                return
+            open_states.remove(state)
+            closed.add(state)
+            if stats is not None: stats.expand(len(frontier), len(costs))
+            for action, new_state, action_cost in problem.iter_successors(state):
+                new_cost = cost + action_cost
+                if stats is not None: stats.generated += 1
+                if new_cost >= costs.get(new_state, math.inf):
+                    if stats is not None: stats.duplicates += 1
+                    continue
+                costs[new_state] = new_cost
+                parents[new_state] = (state, action)
+                # The goal states are never expanded, the path to a goal is yielded as soon as it is cheaper than the best one
+                if problem.is_goal(new_state):
+                    if new_cost < goal_cost:
+                        goal_cost = new_cost
+                        actions, goal = [], new_state
+                        while parents[goal] is not None:
+                            goal, goal_action = parents[goal]
+                            actions.append(goal_action)
+                        actions.reverse()
+                        yield actions
+                    continue
+                if new_state not in heuristics:
+                    heuristics[new_state] = successor_heuristic(problem, new_state, state)
+                if new_state in closed:
+                    inconsistent.add(new_state)
+                else:
+                    open_states.add(new_state)
+                    frontier.push(new_cost + epsilon * heuristics[new_state], (new_cost, new_state))
+        # The last search with epsilon = 1 is an A* search so its solution is optimal
+        if epsilon <= 1:
+            return
+        epsilon = max(1.0, epsilon - decrement)
+        open_states |= inconsistent
+        inconsistent = set()
+
+# Returns the last solution generated by an anytime search (the best one), or None if no solution was generated
+def LastSolution(solutions: Iterator[Solution]) -> Solution:
+    solution = None
+    for solution in solutions:
+        pass
+    return solution
+
+# Iterative deepening A* runs a series of depth first searches where each one prunes every node whose f = g + h
+# exceeds a bound. The first bound is the heuristic of the initial state and each following bound is the smallest f
+# that exceeded the previous one, so the first goal found is optimal if the heuristic is admissible.
+# Only the current path is stored (and checked to avoid cycles), so the memory is O(depth).
+# If transposition_size is positive, a transposition table storing the lowest cost at which each state was reached
+# during the current iteration is used to prune duplicate paths. It holds at most transposition_size states
+# and evicts the least recently updated state when it is full.
+def IterativeDeepeningAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, transposition_size: int = 0,
+                                  stats: Optional[SearchStats] = None) -> Solution:
+    root = SearchNode(initial_state)
+    if problem.is_goal(initial_state):
+        return root.path()
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    bound = heuristic(problem, initial_state)
+    successor_heuristic = SuccessorHeuristic(heuristic)
+    done = object() # A sentinel to detect when a node has no remaining successors
+    while True:
+        next_bound = math.inf
+        transpositions = OrderedDict()
+        on_path = {initial_state}
+        if stats is not None: stats.expand(0, 1)
+        stack = [(root, 0, problem.iter_successors(initial_state))]
+        while stack:
+            node, cost, successors = stack[-1]
+            successor = next(successors, done)
+            if successor is done:
+                stack.pop()
+                on_path.discard(node.state)
+                continue
+            action, new_state, action_cost = successor
+            if stats is not None: stats.generated += 1
+            if new_state in on_path:
+                if stats is not None: stats.duplicates += 1
+                continue
+            new_cost = cost + action_cost
+            f = new_cost + successor_heuristic(problem, new_state, node.state)
+            if f > bound:
+                next_bound = min(next_bound, f)
+                continue
+            if transposition_size > 0:
+                if transpositions.get(new_state, math.inf) <= new_cost:
+                    if stats is not None: stats.duplicates += 1
+                    continue
+                transpositions[new_state] = new_cost
+                transpositions.move_to_end(new_state)
+                if len(transpositions) > transposition_size:
+                    transpositions.popitem(last=False)
+            new_node = SearchNode(new_state, node, action)
+            if problem.is_goal(new_state):
+                return new_node.path()
+            on_path.add(new_state)
+            # The visited states of IDA* are the states on the current path and in the transposition table
+            if stats is not None: stats.expand(len(stack), len(on_path) + len(transpositions))
+            stack.append((new_node, new_cost, problem.iter_successors(new_state)))
+        # If nothing was pruned, the whole reachable space was searched without finding a goal
+        if next_bound == math.inf:
+            return None
+        bound = next_bound
+
+# The bidirectional search runs a forward search from the initial state and a backward search from the goal
+# on the reversed problem (returned by problem.reverse()) and stops once the two searches prove that no path
+# through the unexplored nodes could be cheaper than the best path found where they met.
+# It requires the problem to have a single goal and to use the next state as the action (like the graph routing problem),
+# so that the backward half of the path can be converted back to forward actions.
+# The potential is used to guide both searches: the forward search orders the nodes by g + potential
+# and the backward search orders them by g - potential. If the potential is zero, this is a bidirectional Dijkstra.
+# To return the optimal path, the potential must not make any edge cost negative in either direction.
+def _BidirectionalSearch(problem: Problem[S, A], reverse: Problem[S, A], initial_state: S, potential: Callable[[S], float],
+                         stats: Optional[SearchStats] = None) -> Solution:
+    if problem.is_goal(initial_state):
+        return []
+    goal_state = reverse.get_initial_state()
+    # Each side has a problem, a frontier, the best known cost to every state and the node that reached it with that cost
+    # sign is used to add the potential in the forward search and subtract it in the backward search
+    sides = []
+    for side_problem, root, sign in ((problem, initial_state, 1), (reverse, goal_state, -1)):
+        frontier = PriorityFrontier()
+        frontier.push(sign * potential(root), (0, SearchNode(root)))
+        sides.append((side_problem, frontier, {root: 0}, {root: SearchNode(root)}, sign))
+    best_cost, meeting_state = math.inf, None
+    while sides[0][1] and sides[1][1]:
+        # The smallest keys in both frontiers give a lower bound on the cost of any path that was not found yet
+        if sides[0][1].peek_priority() + sides[1][1].peek_priority() >= best_cost:
+            break
+        # Expand the side with the smaller frontier to keep both searches balanced
+        side = 0 if len(sides[0][1]) <= len(sides[1][1]) else 1
+        side_problem, frontier, costs, nodes, sign = sides[side]
+        other_costs = sides[1 - side][2]
+        _, (cost, node) = frontier.pop()
+        state = node.state
+        if cost > costs[state]:
+            if stats is not None: stats.duplicates += 1
+            continue
+        if stats is not None: stats.expand(len(sides[0][1]) + len(sides[1][1]), len(sides[0][2]) + len(sides[1][2]))
+        for action, new_state, action_cost in side_problem.iter_successors(state):
+            new_cost = cost + action_cost
+            if stats is not None: stats.generated += 1
+            if new_state in costs and costs[new_state] <= new_cost:
+                if stats is not None: stats.duplicates += 1
+                continue
+            costs[new_state] = new_cost
+            new_node = SearchNode(new_state, node, action)
+            nodes[new_state] = new_node
+            frontier.push(new_cost + sign * potential(new_state), (new_cost, new_node))
+            if new_state in other_costs and new_cost + other_costs[new_state] < best_cost:
+                best_cost, meeting_state = new_cost + other_costs[new_state], new_state
+    if meeting_state is None:
+        return None
+    # The forward half is the path to the meeting state and the backward half is found by following
+    # the parents of the backward node since each parent is the next state on the path to the goal
+    path = sides[0][3][meeting_state].path()
+    node = sides[1][3][meeting_state]
+    while node.parent is not None:
+        node = node.parent
+        path.append(node.state)
+    return path
+
+def BidirectionalUniformCostSearch(problem: Problem[S, A], initial_state: S, stats: Optional[SearchStats] = None) -> Solution:
+    return _BidirectionalSearch(problem, problem.reverse(), initial_state, lambda _: 0, stats)
+
+# The bidirectional A* uses half the difference between the forward and backward heuristics as the potential
+# where the backward heuristic is the heuristic of the reversed problem (the estimated cost from the start).
+# If the heuristic is consistent in both directions, this potential keeps every edge cost non-negative.
+def BidirectionalAStarSearch(problem: Problem[S, A], initial_state: S, heuristic: HeuristicFunction, stats: Optional[SearchStats] = None) -> Solution:
+    if stats is not None: heuristic = stats.timed_heuristic(heuristic)
+    reverse = problem.reverse()
+    potential = lambda state: (heuristic(problem, state) - heuristic(reverse, state)) / 2
+    return _BidirectionalSearch(problem, reverse, initial_state, potential, stats)
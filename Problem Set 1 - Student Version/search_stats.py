@@ -0,0 +1,81 @@
+from typing import Any, Callable, Dict, Iterator
+from contextlib import contextmanager
+import json, time
+
+from problem import HeuristicFunction
+
+# This file contains the statistics that the search functions can collect while searching
+# Every search function accepts an optional "stats" argument. When it is None (the default), nothing is collected
+# so the only cost is a check per node. Unlike track_call_count, the statistics belong to a single run
+# (they are not stored on the functions), so different searches can be measured separately.
+
+class SearchStats:
+    __slots__ = ("expanded", "generated", "duplicates", "peak_frontier", "peak_visited",
+                 "heuristic_calls", "heuristic_seconds", "phases")
+
+    def __init__(self) -> None:
+        self.expanded = 0               # The number of nodes whose successors were generated
+        self.generated = 0              # The number of successor nodes that were generated
+        self.duplicates = 0             # The number of nodes that were discarded since their state was already reached (at a lower or equal cost)
+        self.peak_frontier = 0          # The largest frontier size (measured whenever a node is expanded)
+        self.peak_visited = 0           # The largest number of stored visited states (measured whenever a node is expanded)
+        self.heuristic_calls = 0        # The number of heuristic evaluations
+        self.heuristic_seconds = 0.0    # The total time spent in the heuristic
+        self.phases: Dict[str, float] = {} # The total time spent in each phase (see "phase")
+
+    # Record the expansion of a node given the current sizes of the frontier and the visited states
+    def expand(self, frontier_size: int, visited_size: int) -> None:
+        self.expanded += 1
+        if frontier_size > self.peak_frontier: self.peak_frontier = frontier_size
+        if visited_size > self.peak_visited: self.peak_visited = visited_size
+
+    # Returns the heuristic wrapped to count its calls and measure their time
+    # If the heuristic has an "incremental" version (see search.SuccessorHeuristic), it is wrapped too
+    def timed_heuristic(self, heuristic: HeuristicFunction) -> HeuristicFunction:
+        def timed(*args):
+            start = time.perf_counter()
+            value = heuristic(*args)
+            self.heuristic_seconds += time.perf_counter() - start
+            self.heuristic_calls += 1
+            return value
+        incremental = getattr(heuristic, "incremental", None)
+        if incremental is not None:
+            def timed_incremental(*args):
+                start = time.perf_counter()
+                value = incremental(*args)
+                self.heuristic_seconds += time.perf_counter() - start
+                self.heuristic_calls += 1
+                return value
+            timed.incremental = timed_incremental
+        return timed
+
+    # Measure the time spent in the body of a "with" statement and add it to the given phase
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "duplicates": self.duplicates,
+            "peak_frontier": self.peak_frontier,
+            "peak_visited": self.peak_visited,
+            "heuristic_calls": self.heuristic_calls,
+            "heuristic_seconds": self.heuristic_seconds,
+            "phases": dict(self.phases),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+# Returns a search function that passes the stats to the given search function and adds its time to the "search" phase
+def with_stats(search_fn: Callable, stats: SearchStats) -> Callable:
+    def search(*args, **kwargs):
+        with stats.phase("search"):
+            return search_fn(*args, stats=stats, **kwargs)
+    return search
@@ -1,8 +1,12 @@
 from dataclasses import dataclass
-from typing import FrozenSet, Iterable
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
+from collections import deque
+from functools import lru_cache
+from array import array
 from enum import Enum
+import hashlib, os
 
-from mathutils import Direction, Point
+from mathutils import Direction, Point, neighbors
 from problem import Problem
 from helpers.utils import track_call_count
 
@@ -68,11 +72,172 @@ AllSokobanActions = [
     Direction.LEFT
 ]
 
+# This enum represents the deadlock pruning modes of the sokoban problem
+# When pruning is enabled, get_actions will not return the pushes that lead to a state from which the goal can never be reached
+class SokobanPruning(str, Enum):
+    NONE   = "none"   # No pruning
+    DEAD   = "dead"   # Never push a crate into a dead square
+    FREEZE = "freeze" # Same as DEAD and never push a crate to where it becomes frozen (can never move again) outside a goal
+
+# The layouts are compared by identity (see SokobanLayout), so every load of the same level creates a different layout.
+# The data computed for a layout is cached by the content of the layout instead, so it is reused when the level is loaded again,
+# and only the data of the last LAYOUT_CACHE_SIZE layouts is kept so long running processes (like the batch workers) do not accumulate it
+LAYOUT_CACHE_SIZE = 16
+
+def layout_key(layout: SokobanLayout) -> Tuple[int, int, FrozenSet[Point], FrozenSet[Point]]:
+    return (layout.width, layout.height, layout.walkable, layout.goals)
+
+# Decorates a function whose first argument is a layout so that its results are cached by the content of the layout
+def layout_cache(fn):
+    @lru_cache(maxsize=LAYOUT_CACHE_SIZE)
+    def cached(key: Tuple, *args):
+        return fn(SokobanLayout(*key), *args)
+    def decorated(layout: SokobanLayout, *args):
+        return cached(layout_key(layout), *args)
+    decorated.cache_info, decorated.cache_clear = cached.cache_info, cached.cache_clear
+    return decorated
+
+# A dead square is a square from which a crate can never be pushed to any goal
+# To find them, we start from the goals and find all the squares from which a crate can be pulled to a goal.
+# A crate can be pulled from 'crate + vector' to 'crate' if the player has room to stand at 'crate + 2 * vector'.
+# The result is cached so that it is computed once per layout
+@layout_cache
+def compute_dead_squares(layout: SokobanLayout) -> FrozenSet[Point]:
+    live = set(layout.goals)
+    queue = deque(layout.goals)
+    while queue:
+        crate = queue.popleft()
+        for direction in Direction:
+            vector = direction.to_vector()
+            previous = crate + vector
+            if previous in live or previous not in layout.walkable or previous + vector not in layout.walkable:
+                continue
+            live.add(previous)
+            queue.append(previous)
+    return layout.walkable - live
+
+# The push distances contain the minimum number of pushes needed to move a crate from every cell to every goal
+# ignoring the other crates (and assuming that the player can always reach the position behind the crate).
+# The cells and the goals are ordered row by row (like the compact layout) and the distances are stored in a flat array
+# where table[cell_index * len(goals) + goal_index] is the distance. Unreachable pairs have the distance width * height + 1
+@dataclass(eq=False, frozen=True)
+class PushDistances:
+    __slots__ = ("cells", "goals", "table")
+    cells: Tuple[Point, ...]
+    goals: Tuple[Point, ...]
+    table: array
+
+    # Returns the distances from the cell at the given index to every goal
+    def row(self, cell_index: int) -> List[int]:
+        count = len(self.goals)
+        return self.table[cell_index * count:(cell_index + 1) * count].tolist()
+
+# Compute the push distances by running a BFS from every goal where a crate is pulled from 'current + vector' to 'current'
+# which is only possible if the player has room to stand at 'current + 2 * vector'
+def compute_push_distances(layout: SokobanLayout) -> PushDistances:
+    cells = tuple(sorted(layout.walkable, key=lambda point: (point.y, point.x)))
+    goals = tuple(sorted(layout.goals, key=lambda point: (point.y, point.x)))
+    indices = {cell: index for index, cell in enumerate(cells)}
+    unreachable = layout.width * layout.height + 1
+    count = len(goals)
+    table = array('i', [unreachable]) * (len(cells) * count)
+    for goal_index, goal in enumerate(goals):
+        table[indices[goal] * count + goal_index] = 0
+        queue = deque([goal])
+        while queue:
+            current = queue.popleft()
+            distance = table[indices[current] * count + goal_index] + 1
+            for direction in Direction:
+                vector = direction.to_vector()
+                previous = current + vector
+                if previous not in layout.walkable or previous + vector not in layout.walkable:
+                    continue
+                key = indices[previous] * count + goal_index
+                if table[key] == unreachable:
+                    table[key] = distance
+                    queue.append(previous)
+    return PushDistances(cells, goals, table)
+
+# The data computed for a layout is stored on disk in a file whose name is a hash of the layout content
+# so the solves of the same layout in different processes (or of a level that was renamed) reuse it
+# The version is part of the hash so that changing the format of the data never reads stale files
+def layout_cache_path(layout: SokobanLayout, directory: str, extension: str, version: str) -> str:
+    content = version + "|" + f"{layout.width}x{layout.height}" + "|"
+    content += ";".join(f"{point.x},{point.y}" for point in sorted(layout.walkable, key=lambda point: (point.y, point.x))) + "|"
+    content += ";".join(f"{point.x},{point.y}" for point in sorted(layout.goals, key=lambda point: (point.y, point.x)))
+    return os.path.join(directory, hashlib.sha256(content.encode()).hexdigest()[:32] + "." + extension)
+
+PUSH_DISTANCES_VERSION = "1"
+def push_distances_path(layout: SokobanLayout, directory: str) -> str:
+    return layout_cache_path(layout, directory, "pushdist", PUSH_DISTANCES_VERSION)
+
+# Reads an array with the given type code and length from a cache file
+# Returns None if the file does not exist, can not be read or has the wrong size
+def read_layout_cache(path: str, typecode: str, length: int) -> Optional[array]:
+    try:
+        table = array(typecode)
+        with open(path, 'rb') as f:
+            table.frombytes(f.read())
+    except (OSError, ValueError):
+        return None
+    return table if len(table) == length else None
+
+# Writes an array to a cache file, any error is ignored since the cache is only an optimization
+def write_layout_cache(path: str, table: array) -> None:
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file then rename it so that other processes never read a partial file
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as f:
+            f.write(table.tobytes())
+        os.replace(temporary_path, path)
+    except OSError:
+        pass
+
+# Returns the push distances of the layout (computed once per layout)
+# If a directory is given, the distances are loaded from there if they exist, otherwise they are computed and saved there
+@layout_cache
+def load_push_distances(layout: SokobanLayout, directory: Optional[str] = None) -> PushDistances:
+    if directory is None:
+        return compute_push_distances(layout)
+    path = push_distances_path(layout, directory)
+    cells = tuple(sorted(layout.walkable, key=lambda point: (point.y, point.x)))
+    goals = tuple(sorted(layout.goals, key=lambda point: (point.y, point.x)))
+    table = read_layout_cache(path, 'i', len(cells) * len(goals))
+    if table is not None:
+        return PushDistances(cells, goals, table)
+    distances = compute_push_distances(layout)
+    write_layout_cache(path, distances.table)
+    return distances
+
+# These are the pairs of opposite directions along which a crate can be blocked
+FreezeAxes = [
+    (Direction.LEFT, Direction.RIGHT),
+    (Direction.UP, Direction.DOWN)
+]
+
 # This is the implementation of the sokoban problem
 class SokobanProblem(Problem[SokobanState, Direction]):
     # The problem will contain the sokoban layout and the inital state
     layout: SokobanLayout
     initial_state: SokobanState
+    # The deadlock pruning mode (it is disabled by default)
+    pruning: SokobanPruning = SokobanPruning.NONE
+    # The directory where the precomputed layout data (such as the push distances) is cached on disk (None to disable)
+    cache_directory: Optional[str] = None
+
+    # Returns the push distances of the layout (loaded from the cache directory if possible)
+    def push_distances(self) -> PushDistances:
+        return load_push_distances(self.layout, self.cache_directory)
+
+    # Returns the dead squares of the layout
+    # They are kept in the problem cache since they are needed for every push when the pruning is enabled
+    def dead_squares(self) -> FrozenSet[Point]:
+        cache = self.cache()
+        dead = cache.get('dead_squares')
+        if dead is None:
+            dead = cache['dead_squares'] = compute_dead_squares(self.layout)
+        return dead
 
     def get_initial_state(self) -> SokobanState:
         return self.initial_state
@@ -84,19 +249,58 @@ class SokobanProblem(Problem[SokobanState, Direction]):
     @track_call_count
     def get_actions(self, state: SokobanState) -> Iterable[Direction]:
         actions = []
-        for direction in Direction:
-            position = state.player + direction.to_vector()
+        for direction, position in zip(Direction, neighbors(state.player)):
             # Disallow walking into walls
             if position not in self.layout.walkable: continue
             # Check if walking into a crate
             if position in state.crates:
                 # make sure that the crate is not pushed into a wall or another crate
-                crate_position = position + direction.to_vector()
+                crate_position = neighbors(position)[direction]
                 if crate_position not in self.layout.walkable or crate_position in state.crates:
                     continue
+                # If pruning is enabled, make sure that the push does not create a deadlock
+                if self.pruning != SokobanPruning.NONE and self.is_push_deadlock(state.crates, position, crate_position):
+                    continue
             actions.append(direction)
         return actions
 
+    # Checks if pushing the crate from 'crate' to 'crate_position' leads to a deadlock according to the pruning mode
+    def is_push_deadlock(self, crates: FrozenSet[Point], crate: Point, crate_position: Point) -> bool:
+        if crate_position in self.dead_squares():
+            return True
+        if self.pruning == SokobanPruning.FREEZE:
+            crates = crates.symmetric_difference({crate, crate_position})
+            frozen = []
+            if self.is_frozen(crate_position, crates, set(), frozen):
+                return any(frozen_crate not in self.layout.goals for frozen_crate in frozen)
+        return False
+
+    # Checks if the crate can never move again. A crate is frozen if it is blocked along both axes where it is blocked
+    # along an axis if there is a wall on either side, if both sides are dead squares or if there is a frozen crate on either side.
+    # To avoid infinite recursion, the crates in "blocked" are treated as walls while checking their neighbors.
+    # The frozen crates are appended to "frozen" since the deadlock only happens if one of them is not on a goal.
+    # If the crate is not frozen, the crates that were only frozen by assuming that it is a wall are removed again
+    def is_frozen(self, crate: Point, crates: FrozenSet[Point], blocked: Set[Point], frozen: List[Point]) -> bool:
+        walkable, dead = self.layout.walkable, self.dead_squares()
+        blocked.add(crate)
+        frozen_count = len(frozen)
+        for first_direction, second_direction in FreezeAxes:
+            first, second = crate + first_direction.to_vector(), crate + second_direction.to_vector()
+            if first not in walkable or first in blocked or second not in walkable or second in blocked:
+                continue
+            if first in dead and second in dead:
+                continue
+            if first in crates and self.is_frozen(first, crates, blocked, frozen):
+                continue
+            if second in crates and self.is_frozen(second, crates, blocked, frozen):
+                continue
+            blocked.difference_update(frozen[frozen_count:])
+            del frozen[frozen_count:]
+            blocked.discard(crate)
+            return False
+        frozen.append(crate)
+        return True
+
     def get_successor(self, state: SokobanState, action: Direction) -> SokobanState:
         player = state.player + action.to_vector()
         crates = state.crates
@@ -116,6 +320,20 @@ class SokobanProblem(Problem[SokobanState, Direction]):
         # All actions have the same cost
         return 1
 
+    # Generate the successors in the same pass as the actions (the actions are already valid so they are not checked again)
+    def iter_successors(self, state: SokobanState) -> Iterator[Tuple[Direction, SokobanState, float]]:
+        if self.successor_replaced():
+            yield from Problem.iter_successors(self, state)
+            return
+        layout, crates = state.layout, state.crates
+        player_neighbors = neighbors(state.player)
+        for action in self.get_actions(state):
+            player = player_neighbors[action]
+            if player in crates:
+                yield action, SokobanState(layout, player, crates.symmetric_difference({player, neighbors(player)[action]})), 1
+            else:
+                yield action, SokobanState(layout, player, crates), 1
+
     # Read a sokoban problem from text containing a grid of tiles
     @staticmethod
     def from_text(text: str) -> 'SokobanProblem':
@@ -145,7 +363,355 @@ class SokobanProblem(Problem[SokobanState, Direction]):
         return problem
 
     # Read a sokoban problem from file containing a grid of tiles
+    # The layout data is cached in the directory ".sokoban_cache" next to the level file
     @staticmethod
     def from_file(path: str) -> 'SokobanProblem':
         with open(path, 'r') as f:
-            return SokobanProblem.from_text(f.read())
\ No newline at end of file
+            problem = SokobanProblem.from_text(f.read())
+        problem.cache_directory = SokobanProblem.cache_directory_for(path)
+        return problem
+
+    # Returns the directory where the layout data of the given level file is cached
+    @staticmethod
+    def cache_directory_for(path: str) -> str:
+        return os.path.join(os.path.dirname(os.path.abspath(path)), ".sokoban_cache")
+
+# The following is a compact alternative to the sokoban state where the positions are integers instead of points
+# The compact layout assigns a dense index to every walkable cell and precomputes the neighbor of every cell in
+# every direction, so moving does not need any point arithmetic or set lookups
+# The crates are stored as a bitmask where bit 'i' is set if there is a crate on cell 'i'
+# which makes hashing, comparing and updating the crates very cheap
+@dataclass(eq=False, frozen=True)
+class CompactSokobanLayout:
+    __slots__ = ("layout", "cells", "indices", "neighbors", "goals", "dead")
+    layout: SokobanLayout
+    cells: Tuple[Point, ...]                  # The position of every cell index
+    indices: Dict[Point, int]                 # The index of every walkable position
+    neighbors: Tuple[Tuple[int, ...], ...]    # neighbors[cell][direction] is the index of the neighbor or -1 if it is a wall
+    goals: int                                # The bitmask of the goal cells
+    dead: int                                 # The bitmask of the dead squares
+
+    @staticmethod
+    def from_layout(layout: SokobanLayout) -> 'CompactSokobanLayout':
+        cells = tuple(sorted(layout.walkable, key=lambda point: (point.y, point.x)))
+        indices = {cell: index for index, cell in enumerate(cells)}
+        neighbors = tuple(
+            tuple(indices.get(cell + direction.to_vector(), -1) for direction in Direction)
+            for cell in cells
+        )
+        goals = CompactSokobanLayout.mask(indices, layout.goals)
+        dead = CompactSokobanLayout.mask(indices, compute_dead_squares(layout))
+        return CompactSokobanLayout(layout, cells, indices, neighbors, goals, dead)
+
+    # Convert a collection of positions to a bitmask of cell indices
+    @staticmethod
+    def mask(indices: Dict[Point, int], positions: Iterable[Point]) -> int:
+        mask = 0
+        for position in positions:
+            mask |= 1 << indices[position]
+        return mask
+
+# The compact state contains the index of the player cell and the bitmask of the crates
+# The properties "player" and "crates" convert them back to points so the heuristics written for SokobanState still work
+@dataclass(frozen=True)
+class CompactSokobanState:
+    __slots__ = ("layout", "player_index", "crate_mask")
+    layout: CompactSokobanLayout
+    player_index: int
+    crate_mask: int
+
+    @property
+    def player(self) -> Point:
+        return self.layout.cells[self.player_index]
+
+    @property
+    def crates(self) -> FrozenSet[Point]:
+        cells, mask = self.layout.cells, self.crate_mask
+        return frozenset(cells[index] for index in range(mask.bit_length()) if mask >> index & 1)
+
+    # Convert the compact state to a normal sokoban state
+    def to_state(self) -> SokobanState:
+        return SokobanState(self.layout.layout, self.player, self.crates)
+
+    def __str__(self) -> str:
+        return str(self.to_state())
+
+# This is the sokoban problem using the compact state
+# It has the same actions, costs and string representation as the sokoban problem
+# so it can be used with the same search functions and agents
+class CompactSokobanProblem(SokobanProblem):
+    compact_layout: CompactSokobanLayout
+    initial_state: CompactSokobanState
+
+    def is_goal(self, state: CompactSokobanState) -> bool:
+        return self.compact_layout.goals == state.crate_mask
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: CompactSokobanState) -> Iterable[Direction]:
+        actions = []
+        neighbors, crates = self.compact_layout.neighbors, state.crate_mask
+        player_neighbors = neighbors[state.player_index]
+        for direction in Direction:
+            position = player_neighbors[direction]
+            # Disallow walking into walls
+            if position < 0: continue
+            # Check if walking into a crate
+            if crates >> position & 1:
+                # make sure that the crate is not pushed into a wall or another crate
+                crate_position = neighbors[position][direction]
+                if crate_position < 0 or crates >> crate_position & 1:
+                    continue
+                # If pruning is enabled, make sure that the push does not create a deadlock
+                if self.pruning != SokobanPruning.NONE and self.is_push_deadlock(crates, position, crate_position):
+                    continue
+            actions.append(direction)
+        return actions
+
+    # Checks if pushing the crate from 'crate' to 'crate_position' leads to a deadlock according to the pruning mode
+    def is_push_deadlock(self, crates: int, crate: int, crate_position: int) -> bool:
+        if self.compact_layout.dead >> crate_position & 1:
+            return True
+        if self.pruning == SokobanPruning.FREEZE:
+            crates ^= (1 << crate) | (1 << crate_position)
+            frozen = []
+            if self.is_frozen(crate_position, crates, set(), frozen):
+                goals = self.compact_layout.goals
+                return any(not goals >> frozen_crate & 1 for frozen_crate in frozen)
+        return False
+
+    # This is the same as SokobanProblem.is_frozen but it uses the cell indices and the neighbor table
+    def is_frozen(self, crate: int, crates: int, blocked: Set[int], frozen: List[int]) -> bool:
+        neighbors, dead = self.compact_layout.neighbors, self.compact_layout.dead
+        blocked.add(crate)
+        frozen_count = len(frozen)
+        for first_direction, second_direction in FreezeAxes:
+            first, second = neighbors[crate][first_direction], neighbors[crate][second_direction]
+            if first < 0 or first in blocked or second < 0 or second in blocked:
+                continue
+            if dead >> first & 1 and dead >> second & 1:
+                continue
+            if crates >> first & 1 and self.is_frozen(first, crates, blocked, frozen):
+                continue
+            if crates >> second & 1 and self.is_frozen(second, crates, blocked, frozen):
+                continue
+            blocked.difference_update(frozen[frozen_count:])
+            del frozen[frozen_count:]
+            blocked.discard(crate)
+            return False
+        frozen.append(crate)
+        return True
+
+    def get_successor(self, state: CompactSokobanState, action: Direction) -> CompactSokobanState:
+        neighbors, crates = self.compact_layout.neighbors, state.crate_mask
+        player = neighbors[state.player_index][action]
+        if player < 0:
+            # If we try to walk into a wall, then this action is wrong
+            raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        if crates >> player & 1:
+            crate_position = neighbors[player][action]
+            if crate_position < 0 or crates >> crate_position & 1:
+                # If we try to push a crate into a wall or another crate, then this action is wrong
+                raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+            # If we walk to a crate, we push it
+            crates ^= (1 << player) | (1 << crate_position)
+        return CompactSokobanState(state.layout, player, crates)
+
+    # This is the same as SokobanProblem.iter_successors but it uses the cell indices and the neighbor table
+    def iter_successors(self, state: CompactSokobanState) -> Iterator[Tuple[Direction, CompactSokobanState, float]]:
+        if self.successor_replaced():
+            yield from Problem.iter_successors(self, state)
+            return
+        layout, crates = state.layout, state.crate_mask
+        cell_neighbors = self.compact_layout.neighbors
+        player_neighbors = cell_neighbors[state.player_index]
+        for action in self.get_actions(state):
+            player = player_neighbors[action]
+            if crates >> player & 1:
+                yield action, CompactSokobanState(layout, player, crates ^ ((1 << player) | (1 << cell_neighbors[player][action]))), 1
+            else:
+                yield action, CompactSokobanState(layout, player, crates), 1
+
+    # Convert a sokoban problem to a compact sokoban problem
+    @staticmethod
+    def from_problem(problem: SokobanProblem) -> 'CompactSokobanProblem':
+        compact_layout = CompactSokobanLayout.from_layout(problem.layout)
+        state = problem.initial_state
+        compact = CompactSokobanProblem()
+        compact.layout = problem.layout
+        compact.pruning = problem.pruning
+        compact.cache_directory = problem.cache_directory
+        compact.compact_layout = compact_layout
+        compact.initial_state = CompactSokobanState(
+            compact_layout,
+            compact_layout.indices[state.player],
+            CompactSokobanLayout.mask(compact_layout.indices, state.crates)
+        )
+        return compact
+
+    # Read a compact sokoban problem from text containing a grid of tiles
+    @staticmethod
+    def from_text(text: str) -> 'CompactSokobanProblem':
+        return CompactSokobanProblem.from_problem(SokobanProblem.from_text(text))
+
+    # Read a compact sokoban problem from file containing a grid of tiles
+    @staticmethod
+    def from_file(path: str) -> 'CompactSokobanProblem':
+        return CompactSokobanProblem.from_problem(SokobanProblem.from_file(path))
+
+
+# The following is a push level formulation of the sokoban problem where every action is a crate push
+# and the player walks to the push position for free. This makes the search depth equal to the number of pushes
+# instead of the number of player moves, so the search explores far fewer nodes.
+# Since the player can walk anywhere in its reachable area without changing the outcome of the pushes,
+# the state stores a normalized player position (the top-left-most reachable cell) so that states that
+# only differ by where the player stands in the same area are merged.
+# Note: every push costs 1, so the solutions are push-optimal, not step-optimal: they minimize the number of pushes
+# and can take more player moves than the optimal step level solution.
+# Only the heuristics that never overestimate the pushes left (zero and pdb) keep the optimality of A* on this problem,
+# the weak and strong heuristics estimate the player steps so they can overestimate the pushes.
+
+# A push action contains the position of the crate to push and the direction of the push
+@dataclass(frozen=True)
+class SokobanPush:
+    __slots__ = ("crate", "direction")
+    crate: Point
+    direction: Direction
+
+    def __str__(self) -> str:
+        return f'{self.crate}{self.direction}'
+
+# This is the implementation of the push level sokoban problem
+# It uses SokobanState where the player is the normalized player position
+# so the sokoban heuristics and the deadlock pruning can be used with it
+class SokobanPushProblem(SokobanProblem):
+    # The initial state of the step level problem (with the actual player position) which is needed to expand the pushes into steps
+    step_initial_state: SokobanState
+
+    # Returns the set of positions that the player can walk to without pushing any crate
+    def reachable(self, player: Point, crates: FrozenSet[Point]) -> Set[Point]:
+        walkable = self.layout.walkable
+        visited = {player}
+        queue = deque([player])
+        while queue:
+            position = queue.popleft()
+            for direction in Direction:
+                next_position = position + direction.to_vector()
+                if next_position in walkable and next_position not in crates and next_position not in visited:
+                    visited.add(next_position)
+                    queue.append(next_position)
+        return visited
+
+    # Returns the top-left-most position that the player can walk to
+    def normalize(self, player: Point, crates: FrozenSet[Point]) -> Point:
+        return min(self.reachable(player, crates), key=lambda point: (point.y, point.x))
+
+    # We use @track_call_count to track the number of times this function was called to count the number of explored nodes
+    @track_call_count
+    def get_actions(self, state: SokobanState) -> Iterable[SokobanPush]:
+        actions = []
+        walkable, crates = self.layout.walkable, state.crates
+        reachable = self.reachable(state.player, crates)
+        for crate in sorted(crates, key=lambda point: (point.y, point.x)):
+            for direction in Direction:
+                vector = direction.to_vector()
+                # The player must be able to reach the position behind the crate
+                if crate - vector not in reachable: continue
+                # make sure that the crate is not pushed into a wall or another crate
+                crate_position = crate + vector
+                if crate_position not in walkable or crate_position in crates:
+                    continue
+                # If pruning is enabled, make sure that the push does not create a deadlock
+                if self.pruning != SokobanPruning.NONE and self.is_push_deadlock(crates, crate, crate_position):
+                    continue
+                actions.append(SokobanPush(crate, direction))
+        return actions
+
+    def get_successor(self, state: SokobanState, action: SokobanPush) -> SokobanState:
+        crate_position = action.crate + action.direction.to_vector()
+        if action.crate not in state.crates or crate_position not in self.layout.walkable or crate_position in state.crates:
+            # If we try to push a missing crate or push a crate into a wall or another crate, then this action is wrong
+            raise Exception(f"Invalid action {action} in state:" + "\n" + str(state))
+        crates = state.crates.symmetric_difference({action.crate, crate_position})
+        # After the push, the player stands where the crate was
+        return SokobanState(state.layout, self.normalize(action.crate, crates), crates)
+
+    def get_cost(self, state: SokobanState, action: SokobanPush) -> float:
+        # Every push has the same cost
+        return 1
+
+    # Generate the successors in the same pass as the pushes (the pushes are already valid so they are not checked again)
+    def iter_successors(self, state: SokobanState) -> Iterator[Tuple[SokobanPush, SokobanState, float]]:
+        if self.successor_replaced():
+            yield from Problem.iter_successors(self, state)
+            return
+        layout, crates = state.layout, state.crates
+        for action in self.get_actions(state):
+            next_crates = crates.symmetric_difference({action.crate, neighbors(action.crate)[action.direction]})
+            yield action, SokobanState(layout, self.normalize(action.crate, next_crates), next_crates), 1
+
+    # Expand a list of pushes (starting from the step level initial state) into the list of player steps
+    # For every push, the player walks along a shortest path to the position behind the crate then pushes it
+    def expand_path(self, pushes: Iterable[SokobanPush]) -> List[Direction]:
+        walkable = self.layout.walkable
+        player, crates = self.step_initial_state.player, self.step_initial_state.crates
+        steps = []
+        for push in pushes:
+            vector = push.direction.to_vector()
+            target = push.crate - vector
+            # Find a shortest walk from the player to the target using BFS where we store how each position was reached
+            parents = {player: None}
+            queue = deque([player])
+            while queue:
+                position = queue.popleft()
+                if position == target: break
+                for direction in Direction:
+                    next_position = position + direction.to_vector()
+                    if next_position in walkable and next_position not in crates and next_position not in parents:
+                        parents[next_position] = (position, direction)
+                        queue.append(next_position)
+            if target not in parents:
+                raise Exception(f"Invalid push {push}, the player cannot reach {target}")
+            walk = []
+            position = target
+            while parents[position] is not None:
+                position, direction = parents[position]
+                walk.append(direction)
+            steps.extend(reversed(walk))
+            steps.append(push.direction)
+            crates = crates.symmetric_difference({push.crate, push.crate + vector})
+            player = push.crate
+        return steps
+
+    # Create a push level problem that starts from the given state of a sokoban problem
+    @staticmethod
+    def from_state(problem: SokobanProblem, state: SokobanState) -> 'SokobanPushProblem':
+        player, crates = state.player, frozenset(state.crates)
+        push_problem = SokobanPushProblem()
+        push_problem.layout = problem.layout
+        push_problem.pruning = problem.pruning
+        push_problem.cache_directory = problem.cache_directory
+        push_problem.step_initial_state = SokobanState(problem.layout, player, crates)
+        push_problem.initial_state = SokobanState(problem.layout, push_problem.normalize(player, crates), crates)
+        return push_problem
+
+    # Read a push level sokoban problem from text containing a grid of tiles
+    @staticmethod
+    def from_text(text: str) -> 'SokobanPushProblem':
+        problem = SokobanProblem.from_text(text)
+        return SokobanPushProblem.from_state(problem, problem.initial_state)
+
+    # Read a push level sokoban problem from file containing a grid of tiles
+    @staticmethod
+    def from_file(path: str) -> 'SokobanPushProblem':
+        problem = SokobanProblem.from_file(path)
+        return SokobanPushProblem.from_state(problem, problem.initial_state)
+
+# Convert a search function into one that solves a (step level) sokoban problem by searching over the pushes
+# then expanding the pushes back into player steps
+def push_level_search(search_fn):
+    def search(problem: SokobanProblem, state: SokobanState, *args, **kwargs) -> List[Direction]:
+        push_problem = SokobanPushProblem.from_state(problem, state)
+        path = search_fn(push_problem, push_problem.get_initial_state(), *args, **kwargs)
+        return None if path is None else push_problem.expand_path(path)
+    return search
@@ -1,4 +1,4 @@
-from sokoban import SokobanProblem, SokobanState
+from sokoban import CompactSokobanLayout, CompactSokobanState, SokobanProblem, SokobanState
 from mathutils import Direction, Point, manhattan_distance
 from helpers.utils import NotImplemented
 
@@ -8,20 +8,65 @@ def weak_heuristic(problem: SokobanProblem, state: SokobanState):
     return min(manhattan_distance(state.player, crate) for crate in state.crates) - 1
 
 #TODO: Import any modules and write any functions you want to use
-from typing import List
+from typing import Dict, List, Tuple
+from sokoban_pdb import PDB_UNREACHABLE, additive_cost, load_pattern_databases
 
-def ckmin(a: int, b: int) -> bool:
-    return min(a,b), b < a
+def hungarian_phase(cost_matrix: List[List[float]], job: List[int], ys: List[float], yt: List[float], j_cur: int):
+    '''
+        Assigns the j_cur-th job by finding a shortest augmenting path using the current potentials (ys, yt).
+        The assignment (job) and the potentials are updated in place. This takes O(J * W) time.
+        The potentials must be feasible: cost_matrix[j][w] - ys[j] - yt[w] >= 0 for every j and w
+        and the equality must hold for every assigned pair.
+    '''
+    W = len(cost_matrix[0])
+    inf = float('inf')
+    w_cur = W
+    job[w_cur] = j_cur
+    # min reduced cost over edges from Z to worker w
+    min_to = [inf] * (W + 1)
+    prv = [-1] * (W + 1) # previous woker on alternating path
+    in_Z = [False] * (W + 1) # whether worker is in Z
+    while job[w_cur] != -1: # runs at most j_cur + 1 times
+        in_Z[w_cur] = True
+        j = job[w_cur]
+        row, y_j = cost_matrix[j], ys[j]
+        delta = inf
+        w_next = None
+        for w in range(W):
+            if not in_Z[w]:
+                reduced = row[w] - y_j - yt[w]
+                if reduced < min_to[w]:
+                    min_to[w] = reduced
+                    prv[w] = w_cur
+                if min_to[w] < delta:
+                    delta = min_to[w]
+                    w_next = w
+        # delta will always be non-negative
+        # except possibly during the first time this loop runs
+        # if any entries of cost_matrix[j_cur] are negative
+        for w in range(W + 1):
+            if in_Z[w]:
+                ys[job[w]] += delta
+                yt[w] -= delta
+            else:
+                min_to[w] -= delta
+        w_cur = w_next
+    # update assignments along alternating path
+    w = None
+    while w_cur != W:
+        w = prv[w_cur]
+        job[w_cur] = job[w]
+        w_cur = w
 
-def hungarian(cost_matrix: List[List[float]]) -> int:
+def hungarian_assignment(cost_matrix: List[List[float]]) -> Tuple[float, List[int], List[float], List[float]]:
     '''
         Given J jobs and W workers, the cost_matrix is a JxW matrix where cost_matrix[j][w] is the cost of assigning job j to worker w.
-        The function returns the minimum cost of assigning each job to a worker such that each worker is assigned at most one job.
+        The function returns the minimum cost of assigning each job to a worker such that each worker is assigned at most one job
+        along with the assignment (job[w] = job assigned to w-th worker, -1 if not assigned) and the potentials (ys, yt).
         Implementation inspired from: https://en.wikipedia.org/wiki/Hungarian_algorithm
     '''
     J = len(cost_matrix)
     W = len(cost_matrix[0])
-    # job[w] = job assigned to w-th worker, -1 if not assigned
     # note: a W-th worker was added for convencience
     job = [-1] * (W + 1)
     ys = [0] * (J)
@@ -29,44 +74,59 @@ def hungarian(cost_matrix: List[List[float]]) -> int:
     yt = [0] * (W + 1)
     answer = -1
     for j_cur in range(J): # assign j_cur-th job
-        w_cur = W
-        job[w_cur] = j_cur
-        # min reduced cost over edges from Z to worker w
-        min_to = [float('inf')] * (W + 1)
-        prv = [-1] * (W + 1) # previous woker on alternating path
-        in_Z = [False] * (W + 1) # whether worker is in Z
-        while job[w_cur] != -1: # runs at most j_cur + 1 times
-            in_Z[w_cur] = True
-            j = job[w_cur]
-            delta = float('inf')
-            w_next = None
-            for w in range(W):
-                if not in_Z[w]:
-                    min_to[w], is_smaller = ckmin(min_to[w], cost_matrix[j][w] - ys[j] - yt[w])
-                    if is_smaller:
-                        prv[w] = w_cur
-                    delta, is_smaller = ckmin(delta, min_to[w])
-                    if is_smaller:
-                        w_next = w
-            # delta will always be non-negative
-            # except possibly during the first time this loop runs
-            # if any entries of cost_matrix[j_cur] are negative
-            for w in range(W + 1):
-                if in_Z[w]:
-                    ys[job[w]] += delta
-                    yt[w] -= delta
-                else:
-                    min_to[w] -= delta
-            w_cur = w_next
-        # update assignments along alternating path
-        w = None
-        while w_cur != W:
-            w = prv[w_cur]
-            job[w_cur] = job[w]
-            w_cur = w
+        hungarian_phase(cost_matrix, job, ys, yt, j_cur)
         answer = -yt[W]
-    return answer
+    return answer, job, ys, yt
+
+def hungarian(cost_matrix: List[List[float]]) -> float:
+    return hungarian_assignment(cost_matrix)[0]
+
+
+# Build the data shared by all the evaluations of the strong heuristic and store it in the problem cache
+def strong_heuristic_cache(problem: SokobanProblem) -> Dict:
+    cache = problem.cache()
+    if 'distances' not in cache:
+        # the push distances from every cell to every goal are precomputed once per layout (and cached on disk)
+        # the cells are indexed in the same order as the compact sokoban layout (row by row)
+        # so that the crates can be converted to a bitmask which is used as the key of the solved states
+        distances = problem.push_distances()
+        cache['distances'] = distances
+        cache['indices'] = {cell: index for index, cell in enumerate(distances.cells)}
+        cache['masks'] = {}
+        # the row of the cost matrix for every crate index (the distances from the crate to every goal)
+        cache['rows'] = {}
+        cache['solved_states'] = {}
+        # the assignment of every solved state (the crate index of every row, the cost matrix, job, ys, yt)
+        # which is used to evaluate its successors incrementally
+        cache['assignments'] = {}
+    return cache
+
+# Returns the bitmask of the crates
+# For the normal sokoban state, the bitmask of every set of crates is cached (the hash of a frozenset is cached by python so the lookup is cheap)
+def crate_mask(cache: Dict, state: SokobanState) -> int:
+    if isinstance(state, CompactSokobanState):
+        return state.crate_mask
+    masks = cache['masks']
+    mask = masks.get(state.crates)
+    if mask is None:
+        indices = cache['indices']
+        mask = 0
+        for crate in state.crates:
+            mask |= 1 << indices[crate]
+        masks[state.crates] = mask
+    return mask
+
+# Returns the list of crate indices in a bitmask
+def crate_indices(mask: int) -> List[int]:
+    return [index for index in range(mask.bit_length()) if mask >> index & 1]
 
+# Returns the row of the cost matrix for the crate at the given index
+def cost_row(problem: SokobanProblem, cache: Dict, index: int) -> List[int]:
+    rows = cache['rows']
+    row = rows.get(index)
+    if row is None:
+        row = rows[index] = cache['distances'].row(index)
+    return row
 
 def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     #TODO: ADD YOUR CODE HERE
@@ -75,50 +135,90 @@ def strong_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
     # which is the number of get_actions calls during the search
     #NOTE: you can use problem.cache() to get a dictionary in which you can store information that will persist between calls of this function
     # This could be useful if you want to store the results heavy computations that can be cached and used across multiple calls of this function
-    
-    # Cache pair wise distance between any two points
-    if 'distances' not in problem.cache():
-        # construct for each of the goals a bfs distance matrix to all tiles in the layout
-        # while moving only in the 4 cardinal directions
-        # if a tile is not reachable from a goal, the distance is set to infinity
-        # if a tile is reachable then you need to check if we took another step
-        # from the direction we just came from, does it hit a wall or not (meaning not in walkable)
-        # if it does then the distance is set to infinity, if not then the distance is set to the number of steps taken
-        distances = {}
-        mx = problem.layout.height * problem.layout.width + 1
-        for goal in problem.layout.goals:
-            distance = [[mx] * problem.layout.height for _ in range(problem.layout.width)]
-            distance[goal.x][goal.y] = 0
-            queue = [goal]
-            while queue:
-                current = queue.pop(0)
-                for direction in Direction:
-                    next_tile = current + direction.to_vector()
-                    if next_tile not in problem.layout.walkable:
-                        continue
-                    if distance[next_tile.x][next_tile.y] == mx:
-                        forward_tile = next_tile + direction.to_vector()
-                        if forward_tile in problem.layout.walkable:
-                            distance[next_tile.x][next_tile.y] = distance[current.x][current.y] + 1
-                            queue.append(next_tile)
-            distances[goal] = distance
-        problem.cache()['distances'] = distances
-        problem.cache()['solved_states'] = {}
-
-    # check if the state is already solved by sorting crates and hashing them
-    # and check if hash key in problem.cache()['solved_states']
-
-    sorted_crates = sorted(state.crates, key=lambda point: (point.x, point.y))
-    state_hash = hash(tuple(sorted_crates))
-    if state_hash in problem.cache()['solved_states']:
-        return problem.cache()['solved_states'][state_hash]
-
-    cost_matrix = []
-    for crate in state.crates:
-        row = []
-        for goal in problem.layout.goals:
-            row.append(problem.cache()['distances'][goal][crate.x][crate.y])
-        cost_matrix.append(row)
-    
-    problem.cache()['solved_states'][state_hash] = hungarian(cost_matrix)
-    return problem.cache()['solved_states'][state_hash]
\ No newline at end of file
+    cache = strong_heuristic_cache(problem)
+
+    # check if the state is already solved using the bitmask of the crates as a key
+    mask = crate_mask(cache, state)
+    solved_states = cache['solved_states']
+    if mask in solved_states:
+        return solved_states[mask]
+
+    indices = crate_indices(mask)
+    cost_matrix = [cost_row(problem, cache, index) for index in indices]
+    # keep the assignment when it can be updated incrementally (a square matrix)
+    if len(indices) == len(problem.layout.goals):
+        answer, job, ys, yt = hungarian_assignment(cost_matrix)
+        cache['assignments'][mask] = (indices, cost_matrix, job, ys, yt)
+    else:
+        answer = hungarian(cost_matrix)
+    solved_states[mask] = answer
+    return answer
+
+# This is the incremental version of the strong heuristic which is used by the search functions to evaluate a successor
+# When a single crate was pushed between the parent and the state, the assignment of the parent is reused:
+# the row of the pushed crate is replaced, the crate is unassigned and its row potential is lowered to keep the potentials feasible,
+# then a single phase of the hungarian algorithm reassigns it in O(n^2) instead of solving the whole assignment in O(n^3)
+def strong_heuristic_incremental(problem: SokobanProblem, state: SokobanState, parent_state: SokobanState) -> float:
+    cache = strong_heuristic_cache(problem)
+    mask = crate_mask(cache, state)
+    solved_states = cache['solved_states']
+    if mask in solved_states:
+        return solved_states[mask]
+    parent_mask = crate_mask(cache, parent_state)
+    parent = cache['assignments'].get(parent_mask)
+    removed, added = parent_mask & ~mask, mask & ~parent_mask
+    # Fall back to the full evaluation if the parent was not solved incrementally or if more than one crate moved
+    if parent is None or removed & (removed - 1) or added & (added - 1):
+        return strong_heuristic(problem, state)
+    indices, cost_matrix, job, ys, yt = parent
+    j = indices.index(removed.bit_length() - 1)
+    new_index = added.bit_length() - 1
+    indices, cost_matrix, job, ys, yt = list(indices), list(cost_matrix), list(job), list(ys), list(yt)
+    indices[j] = new_index
+    row = cost_matrix[j] = cost_row(problem, cache, new_index)
+    W = len(row)
+    job[job.index(j, 0, W)] = -1
+    ys[j] = min(row[w] - yt[w] for w in range(W))
+    hungarian_phase(cost_matrix, job, ys, yt, j)
+    answer = sum(cost_matrix[job[w]][w] for w in range(W))
+    cache['assignments'][mask] = (indices, cost_matrix, job, ys, yt)
+    solved_states[mask] = answer
+    return answer
+
+# The search functions use the "incremental" attribute of a heuristic (if it exists) to evaluate the successors
+strong_heuristic.incremental = strong_heuristic_incremental
+
+# This heuristic adds the exact costs of disjoint groups of goals stored in pattern databases (see sokoban_pdb.py)
+# Unlike the strong heuristic, it accounts for the interactions between the crates in the same group and for the player position
+# It is consistent since moving the player (or pushing a single crate) changes the cost of at most one group by at most 1
+def pdb_heuristic(problem: SokobanProblem, state: SokobanState) -> float:
+    cache = problem.cache()
+    if 'pdb' not in cache:
+        databases = load_pattern_databases(problem.layout, problem.cache_directory)
+        cache['pdb'] = databases
+        cache['pdb_indices'] = CompactSokobanLayout.from_layout(problem.layout).indices
+        cache['pdb_solved_states'] = {}
+        # The value returned for the states where no group can be solved (a deadlock)
+        # It is larger than any sum of costs so the heuristic stays consistent
+        cache['pdb_unreachable'] = len(databases) * PDB_UNREACHABLE
+    if isinstance(state, CompactSokobanState):
+        player, mask = state.player_index, state.crate_mask
+        key = (player, mask)
+        crates = None
+    else:
+        key = (state.player, state.crates)
+        player, crates = None, state.crates
+    solved_states = cache['pdb_solved_states']
+    if key in solved_states:
+        return solved_states[key]
+    if crates is None:
+        crates = crate_indices(mask)
+    else:
+        indices = cache['pdb_indices']
+        player = indices[state.player]
+        crates = sorted(indices[crate] for crate in crates)
+    answer = additive_cost(cache['pdb'], crates, player)
+    if answer is None:
+        answer = cache['pdb_unreachable']
+    solved_states[key] = answer
+    return answer
@@ -0,0 +1,149 @@
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+from itertools import combinations
+from collections import deque
+from array import array
+from math import comb
+
+from sokoban import CompactSokobanLayout, SokobanLayout, layout_cache, layout_cache_path, read_layout_cache, write_layout_cache
+
+# This file contains the additive pattern databases used by the pdb heuristic
+# The goals are split into groups (patterns) and for every group we store the exact number of pushes needed
+# to move any subset of crates (of the same size as the group) onto the goals of this group from any player position
+# while ignoring every other crate.
+# Since the pushes of different crates are disjoint, the costs of the groups can be added
+# as long as every crate is counted in exactly one group.
+
+# The number of goals in every pattern (the last pattern may be smaller)
+PDB_PATTERN_SIZE = 2
+# The value stored for the subsets of crates that can not be pushed onto the goals of the pattern
+PDB_UNREACHABLE = 0xFFFF
+PDB_VERSION = "1"
+
+# Returns the rank of a sorted subset of cell indices in the combinatorial number system
+# The ranks of all the subsets of size k of n cells are exactly the numbers from 0 to comb(n, k) - 1
+def subset_rank(indices: Sequence[int]) -> int:
+    return sum(comb(index, position) for position, index in enumerate(indices, 1))
+
+# A pattern database stores the cost of every (subset of crates, player cell) pair
+# The cost of the subset with rank r and the player at the cell index p is table[r * cell_count + p]
+@dataclass
+class PatternDatabase:
+    __slots__ = ("goals", "cell_count", "table")
+    goals: Tuple[int, ...]      # The cell indices of the goals of this pattern
+    cell_count: int
+    table: array
+
+    @property
+    def size(self) -> int:
+        return len(self.goals)
+
+    # Returns the cost of the sorted subset of crates when the player is at the given cell index
+    def cost(self, crates: Sequence[int], player: int) -> int:
+        return self.table[subset_rank(crates) * self.cell_count + player]
+
+# Returns the cell indices that the player can walk to from the start cell without passing through the crates
+def flood(neighbors: Tuple[Tuple[int, ...], ...], start: int, crates: int) -> List[int]:
+    visited = crates | 1 << start
+    region = [start]
+    stack = [start]
+    while stack:
+        cell = stack.pop()
+        for neighbor in neighbors[cell]:
+            if neighbor >= 0 and not visited >> neighbor & 1:
+                visited |= 1 << neighbor
+                region.append(neighbor)
+                stack.append(neighbor)
+    return region
+
+# Builds the table of a pattern by a retrograde BFS (the pushes are reversed into pulls) starting from the goal configurations
+# The abstract state is (the top-left-most cell the player can reach, the bitmask of the crates) like the push level problem
+# so the distance of an abstract state is the exact minimum number of pushes needed to put its crates on the goals
+def build_pattern_database(compact_layout: CompactSokobanLayout, goals: Tuple[int, ...]) -> PatternDatabase:
+    neighbors = compact_layout.neighbors
+    cell_count = len(compact_layout.cells)
+    table = array('H', [PDB_UNREACHABLE]) * (comb(cell_count, len(goals)) * cell_count)
+
+    goal_mask = sum(1 << goal for goal in goals)
+    visited = set()
+    queue = deque()
+    # At the goal configuration, the player can be in any region that is not blocked by the crates
+    for cell in range(cell_count):
+        if goal_mask >> cell & 1: continue
+        player = min(flood(neighbors, cell, goal_mask))
+        if (player, goal_mask) not in visited:
+            visited.add((player, goal_mask))
+            queue.append((player, goal_mask, 0))
+
+    while queue:
+        player, crates, distance = queue.popleft()
+        region = flood(neighbors, player, crates)
+        offset = subset_rank([index for index in range(crates.bit_length()) if crates >> index & 1]) * cell_count
+        for cell in region:
+            table[offset + cell] = distance
+        for cell in region:
+            for direction, crate in enumerate(neighbors[cell]):
+                # The player at 'cell' pulls the crate at 'cell + vector' by stepping to 'cell - vector'
+                if crate < 0 or not crates >> crate & 1: continue
+                behind = neighbors[cell][(direction + 2) % 4]
+                if behind < 0 or crates >> behind & 1: continue
+                next_crates = crates & ~(1 << crate) | 1 << cell
+                next_player = min(flood(neighbors, behind, next_crates))
+                if (next_player, next_crates) not in visited:
+                    visited.add((next_player, next_crates))
+                    queue.append((next_player, next_crates, distance + 1))
+    return PatternDatabase(goals, cell_count, table)
+
+# Splits the goals into patterns of the given size
+# The goals are sorted row by row so the goals in the same pattern are usually close to each other (and interact the most)
+def pattern_goals(compact_layout: CompactSokobanLayout, size: int) -> List[Tuple[int, ...]]:
+    goals = [index for index in range(len(compact_layout.cells)) if compact_layout.goals >> index & 1]
+    return [tuple(goals[start:start + size]) for start in range(0, len(goals), size)]
+
+# Returns the pattern databases of the layout (built once per layout)
+# If a directory is given, the tables are loaded from there if they exist, otherwise they are built and saved there
+# All the tables are stored in a single file of unsigned 16-bit integers (one after the other in the order of the patterns)
+@layout_cache
+def load_pattern_databases(layout: SokobanLayout, directory: Optional[str] = None, size: int = PDB_PATTERN_SIZE) -> Tuple[PatternDatabase, ...]:
+    compact_layout = CompactSokobanLayout.from_layout(layout)
+    cell_count = len(compact_layout.cells)
+    patterns = pattern_goals(compact_layout, size)
+    lengths = [comb(cell_count, len(goals)) * cell_count for goals in patterns]
+    path = None
+    if directory is not None:
+        path = layout_cache_path(layout, directory, "pdb", f"{PDB_VERSION}-{size}")
+        table = read_layout_cache(path, 'H', sum(lengths))
+        if table is not None:
+            databases, offset = [], 0
+            for goals, length in zip(patterns, lengths):
+                databases.append(PatternDatabase(goals, cell_count, table[offset:offset + length]))
+                offset += length
+            return tuple(databases)
+    databases = tuple(build_pattern_database(compact_layout, goals) for goals in patterns)
+    if path is not None:
+        table = array('H')
+        for database in databases:
+            table.extend(database.table)
+        write_layout_cache(path, table)
+    return databases
+
+# Returns the sum of the pattern costs minimized over every way to split the crates between the patterns
+# The crates are given as sorted cell indices. The split is found by a dynamic programming over the subsets of crates
+# that are already used by the previous patterns. Returns None if no split is solvable.
+def additive_cost(databases: Sequence[PatternDatabase], crates: Sequence[int], player: int) -> Optional[int]:
+    best = {0: 0}
+    for database in databases:
+        next_best = {}
+        for used, cost in best.items():
+            free = [position for position in range(len(crates)) if not used >> position & 1]
+            for chosen in combinations(free, database.size):
+                value = database.cost([crates[position] for position in chosen], player)
+                if value == PDB_UNREACHABLE: continue
+                key = used
+                for position in chosen:
+                    key |= 1 << position
+                total = cost + value
+                if total < next_best.get(key, total + 1):
+                    next_best[key] = total
+        best = next_best
+    return min(best.values()) if best else None
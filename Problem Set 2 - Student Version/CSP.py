@@ -1,4 +1,5 @@
 from typing import Callable, Dict, List, Any, Tuple
+from copy import deepcopy
 from helpers.utils import track_call_count
 
 # This is the type definition for an Assignment
@@ -72,3 +73,12 @@ class Problem:
     # Return True if the assignment satisfies all the constraints.
     def satisfies_constraints(self, assignment: Assignment) -> bool:
         return all(constraint.is_satisfied(assignment) for constraint in self.constraints)
+
+    # Returns a deep copy of the problem except for the constraint objects which are shared since they can not be modified
+    # (the list of constraints is copied), so that modifying the domains or removing constraints (as done by 1-consistency)
+    # does not change the original problem
+    def __copy__(self) -> 'Problem':
+        problem = self.__class__.__new__(self.__class__)
+        memo = {id(constraint): constraint for constraint in self.constraints}
+        problem.__dict__.update(deepcopy(self.__dict__, memo))
+        return problem
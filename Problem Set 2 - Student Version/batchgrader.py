@@ -1,27 +1,154 @@
-import os, subprocess, argparse
-from posixpath import dirname
+import os, subprocess, argparse, hashlib, json, sys, tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+# The batch grader runs the autograder on every student directory (each run is a separate process)
+# Different submissions are graded concurrently but the runs of the same submission are done one after the other,
+# and there are never more runs at the same time than CPUs (each autograder run uses a single CPU), since the tests
+# have time limits and competing for the CPUs would cause false timeouts
+# The grades of every problem and test case are read from the autograder report
+# The results of a submission are cached using a hash of its files and of the grader files,
+# so a submission is only graded again if it (or the grader) changed
+# The grader files are all the files of the problem set (the autograder, the helpers, the test cases and every module
+# they import) except the solution files that the submission provides, since the submitted ones are graded instead
+
+# The version of the cached results (increment it if their format changes)
+CACHE_VERSION = "2"
+
+# Add the content of a file or directory (and the relative paths of its files) to the digest
+# The hidden files and directories and the python caches are skipped
+def hash_path(digest, path: str) -> None:
+    if os.path.isfile(path):
+        digest.update(os.path.basename(path).encode())
+        with open(path, 'rb') as f:
+            digest.update(f.read())
+        return
+    for directory, dirnames, filenames in os.walk(path):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith(".") and name != "__pycache__")
+        for filename in sorted(filenames):
+            if filename.startswith(".") or filename.endswith(".pyc"): continue
+            filepath = os.path.join(directory, filename)
+            digest.update(os.path.relpath(filepath, path).encode())
+            with open(filepath, 'rb') as f:
+                digest.update(f.read())
+
+# Returns the relative path and the hash of every file of the problem set directory (hashed once for all the submissions)
+# The hidden files and directories, the python caches and the excluded paths (the submissions and the outputs) are skipped
+def grader_files(directory: str, excluded: List[str]) -> List[Tuple[str, str]]:
+    excluded = {os.path.abspath(path) for path in excluded}
+    files = []
+    for current, dirnames, filenames in os.walk(directory):
+        dirnames[:] = sorted(name for name in dirnames if not name.startswith(".") and name != "__pycache__"
+                             and os.path.abspath(os.path.join(current, name)) not in excluded)
+        for filename in sorted(filenames):
+            filepath = os.path.join(current, filename)
+            if filename.startswith(".") or filename.endswith(".pyc") or os.path.abspath(filepath) in excluded: continue
+            with open(filepath, 'rb') as f:
+                files.append((os.path.relpath(filepath, directory), hashlib.sha256(f.read()).hexdigest()))
+    return files
+
+# Returns the cache key of a submission: the hash of the grading options, the grader files and the submission files
+# The grader files that the submission provides (its solution files) are skipped since the submitted ones are used
+def submission_hash(dirpath: str, files: List[Tuple[str, str]], repeat: int, timescale: str) -> str:
+    provided = {filename for filename in os.listdir(dirpath) if os.path.isfile(os.path.join(dirpath, filename))}
+    digest = hashlib.sha256(f"{CACHE_VERSION}:{repeat}:{timescale}".encode())
+    for relpath, filehash in files:
+        if relpath not in provided:
+            digest.update(f"{relpath}:{filehash}\n".encode())
+    hash_path(digest, dirpath)
+    return digest.hexdigest()
+
+def read_cache(directory: Optional[str], key: str) -> Optional[List[Dict[str, Any]]]:
+    if directory is None: return None
+    try:
+        with open(os.path.join(directory, f"{key}.json"), 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# Write to a temporary file then rename it so that a partial file is never read
+def write_cache(directory: Optional[str], key: str, runs: List[Dict[str, Any]]) -> None:
+    if directory is None: return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{key}.json")
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    with open(temporary_path, 'w') as f:
+        json.dump(runs, f)
+    os.replace(temporary_path, path)
+
+# Run the autograder once on the given student directory and return its report
+# If the autograder did not write a report (for example, if it crashed), the report only contains the exit code
+def grade(dirpath: str, timescale: str) -> Dict[str, Any]:
+    with tempfile.TemporaryDirectory() as directory:
+        report_path = os.path.join(directory, "report.json")
+        exitcode = subprocess.call(
+            [sys.executable, "autograder.py", "-t", timescale, "-s", dirpath, "-r", report_path],
+            stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        try:
+            with open(report_path, 'r') as f:
+                report = json.load(f)
+        except (OSError, ValueError):
+            report = {"grade": None}
+    report["exitcode"] = exitcode
+    return report
+
+# Run the autograder "repeat" times on the given student directory (one run after the other) and return the reports
+def grade_all(dirpath: str, dirname: str, timescale: str, repeat: int) -> List[Dict[str, Any]]:
+    runs = []
+    for r in range(repeat):
+        report = grade(dirpath, timescale)
+        print(f"Run #{r+1}/{repeat}: {dirname} - Result:", report["grade"])
+        runs.append(report)
+    return runs
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("path")
     parser.add_argument("out")
     parser.add_argument("--repeat", "-r", type=int, default=4)
+    parser.add_argument("--workers", "-w", type=int, default=None,
+                        help="the number of submissions graded at the same time (default and maximum: the number of CPUs)")
+    parser.add_argument("--timescale", "-t", default="1", help="the time scale passed to the autograder")
+    parser.add_argument("--json", "-j", default=None, help="write the grades of every run, problem and test case as JSON to this file")
+    parser.add_argument("--cache", "-c", default=".batchgrader_cache", help="the directory where the results are cached")
+    parser.add_argument("--no-cache", action="store_true", help="grade every submission even if its results are cached")
     args = parser.parse_args()
 
     path: str = args.path
     out: str = args.out
     repeat: int = args.repeat
-    
-    dirnames = [dirname for dirname in os.listdir(path) if os.path.isdir(os.path.join(path, dirname))]    
-    results = {dirname:[] for dirname in dirnames}
-
-    for r in range(1, repeat+1):
-        for index, dirname in enumerate(dirnames):
-            dirpath = os.path.join(path, dirname)
-            print(f"Run #{r}/{repeat}: Grading Student {index+1}/{len(dirnames)} - {dirname}")
-            result = subprocess.call(["python", "autograder.py", "-t", "1", "-s", dirpath], stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
-            results[dirname].append(result)
-            print(f"Result:", result)
-    
+    cache: Optional[str] = None if args.no_cache else args.cache
+
+    dirnames = [dirname for dirname in os.listdir(path) if os.path.isdir(os.path.join(path, dirname))]
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    files = grader_files(os.getcwd(), [path, out, args.json or out, args.cache])
+    keys = {dirname: submission_hash(os.path.join(path, dirname), files, repeat, args.timescale) for dirname in dirnames}
+
+    # Reuse the cached results of the submissions that did not change
+    for dirname in dirnames:
+        runs = read_cache(cache, keys[dirname])
+        if runs is not None:
+            results[dirname] = runs
+            print(f"Cached: {dirname} -", ", ".join(str(run["grade"]) for run in runs))
+
+    cpus = os.cpu_count() or 1
+    workers = min(args.workers or cpus, cpus)
+    if args.workers and args.workers > cpus:
+        print(f"Using {cpus} workers (the number of CPUs) instead of {args.workers}")
+
+    pending = [dirname for dirname in dirnames if dirname not in results]
+    with ThreadPoolExecutor(workers) as executor:
+        futures = {executor.submit(grade_all, os.path.join(path, dirname), dirname, args.timescale, repeat): dirname for dirname in pending}
+        for future in as_completed(futures):
+            dirname = futures[future]
+            results[dirname] = runs = future.result()
+            # The runs where the autograder crashed are not cached so they are retried next time
+            if all(run["grade"] is not None for run in runs):
+                write_cache(cache, keys[dirname], runs)
+
     with open(out, 'w') as f:
-        f.writelines([f"{k}, {', '.join(str(v) for v in vs)}\n" for k, vs in results.items()])
\ No newline at end of file
+        f.writelines([f"{k}, {', '.join(str(run['grade']) for run in results[k])}\n" for k in dirnames])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([{"student": k, "hash": keys[k], "runs": results[k]} for k in dirnames], f, indent=2)
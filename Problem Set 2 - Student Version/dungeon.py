@@ -3,7 +3,7 @@ from copy import deepcopy
 from typing import Iterable, List, Optional, Set, Tuple
 from enum import Enum
 
-from mathutils import Direction, Point
+from mathutils import Direction, Point, neighbors
 from game import Game
 from helpers.utils import track_call_count
 from helpers.mt19937 import RandomGenerator
@@ -111,6 +111,12 @@ class DungeonGame(Game[DungeonState, Direction]):
     def get_initial_state(self) -> DungeonState:
         return self.initial_state
 
+    # Returns a deep copy of the game except for the layout which is shared since it is not modified (see DungeonLayout.__deepcopy__)
+    def __copy__(self) -> 'DungeonGame':
+        game = DungeonGame()
+        game.__dict__.update(deepcopy(self.__dict__))
+        return game
+
     @property
     def agent_count(self) -> int:
         return 1 + len(self.initial_state.monsters)
@@ -139,7 +145,7 @@ class DungeonGame(Game[DungeonState, Direction]):
         if state.turn == 0:
             # Find an return actions to be done by the player
             position_position = state.player.position
-            positions = ((direction, position_position + direction.to_vector()) for direction in Direction)
+            positions = zip(Direction, neighbors(position_position))
             # prevent the player from getting into a wall
             return [direction for direction, position in positions if position in state.layout.walkable]
         else:
@@ -148,7 +154,7 @@ class DungeonGame(Game[DungeonState, Direction]):
             if not state.monsters[index].alive: return []
             monster_locations = {monster.position for i, monster in enumerate(state.monsters) if i != index and monster.alive} 
             monster_position = state.monsters[index].position
-            positions = ((direction, monster_position + direction.to_vector()) for direction in Direction)
+            positions = zip(Direction, neighbors(monster_position))
             # prevent the monster from getting into a wall or another monster
             return [direction for direction, position in positions if position in state.layout.walkable and position not in monster_locations]
 
@@ -157,7 +163,7 @@ class DungeonGame(Game[DungeonState, Direction]):
         current_turn = state.turn
         if current_turn == 0:
             # This action is done by the player
-            new_position = state.player.position + action.to_vector()
+            new_position = neighbors(state.player.position)[action]
             state.player.position = new_position
             if new_position in state.coins:
                 # If we walk over a coin, we take it
@@ -186,7 +192,7 @@ class DungeonGame(Game[DungeonState, Direction]):
         else:
             # This action is done by a monster
             monster = state.monsters[current_turn - 1]
-            new_position = monster.position + action.to_vector()
+            new_position = neighbors(monster.position)[action]
             monster.position = new_position
             if new_position == state.player.position:
                 if state.player.inventory.daggers != 0:
@@ -1,4 +1,5 @@
 from helpers import test_tools
+from helpers.utils import load_problem
 from tree import TreeGame
 from dungeon import DungeonGame
 from sudoku import SudokuProblem
@@ -1,5 +1,5 @@
 from typing import Any, Dict, List, Optional, Tuple
-from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function
+from .utils import Result, fetch_recorded_calls, fetch_tracked_call_count, load_function, load_problem
 import re
 
 ########################################################
@@ -269,7 +269,7 @@ def run_csp_solve_cryptarithmetic(
     ) -> Tuple[Optional[Assignment], str]:
     
     cls = load_function(problem_cls_path)
-    problem = cls.from_file(problem_file)
+    problem = load_problem(cls.from_file, problem_file)
     
     solve = load_function("CSP_solver.solve")
     solution = solve(problem)
@@ -1,10 +1,13 @@
 import os, sys
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import dataclass
 from collections import deque
+from functools import lru_cache
 import importlib
 from importlib import util as ilu
-import traceback
+import traceback, warnings, copy, types
 
 solution_path = ""
 
@@ -12,9 +15,17 @@ def set_solution_path(path: str):
     global solution_path
     solution_path = path
 
+# The directory of the problem set (the parent of the helpers package)
+PROBLEM_SET_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Load a public function (or class) given as "module.function" where the module is a top level module of the problem set
+# (or of the solution path). Any other name (such as a module of the standard library) is rejected
 def load_function(name: str, use_local: bool = False) -> Callable:
     try:
         path, function = name.rsplit(".", 1)
+        directory = solution_path if solution_path and not use_local else PROBLEM_SET_PATH
+        if not path.isidentifier() or function.startswith("_") or not os.path.isfile(os.path.join(directory, path + ".py")):
+            raise ValueError(f"{name} is not a public function of a module in {directory}")
         if solution_path and not use_local:
             spec = ilu.spec_from_file_location(path, os.path.join(solution_path, path + ".py"))
             module = ilu.module_from_spec(spec)
@@ -22,7 +33,10 @@ def load_function(name: str, use_local: bool = False) -> Callable:
             spec.loader.exec_module(module)
         else:
             module = importlib.import_module(path)
-        return getattr(module, function)
+        value = getattr(module, function)
+        if isinstance(value, types.ModuleType):
+            raise ValueError(f"{name} is a module, not a function")
+        return value
     except Exception as err:
         print(f"Error while loading function {name}")
         print(traceback.format_exc())
@@ -42,32 +56,94 @@ class Arguments:
 def NotImplemented():
     raise NotImplementedError()
 
+# The following decorators track the calls of the functions that the autograder uses to count the explored nodes
+# The counters and the recorded calls are stored in a CallTracker held by a context variable, so every thread
+# (and every "with tracking_context()" block) has its own tracker and concurrent runs do not corrupt each other's counts
+# If the environment variable TRACK_CALLS is set to 0 before the decorated functions are defined,
+# the decorators return the functions unchanged so tracking costs nothing (and fetching the counts or the calls raises an error)
+TRACKING_ENABLED = os.environ.get("TRACK_CALLS", "1") != "0"
+
+# The default maximum number of calls kept by record_calls (the oldest calls are dropped first and counted as dropped)
+DEFAULT_RECORD_CAPACITY = 2**16
+
+class CallTracker:
+    __slots__ = ("counts", "records", "dropped")
+
+    def __init__(self) -> None:
+        self.counts: Dict[Callable, int] = {}       # The number of calls of every tracked function
+        self.records: Dict[Callable, Deque] = {}    # The recorded calls of every recorded function
+        self.dropped: Dict[Callable, int] = {}      # The number of recorded calls dropped because the records were full
+
+_current_tracker: ContextVar[Optional[CallTracker]] = ContextVar("call_tracker", default=None)
+
+# Returns the tracker of the current context (a new thread starts with an empty context so it gets its own tracker)
+def current_tracker() -> CallTracker:
+    tracker = _current_tracker.get()
+    if tracker is None:
+        tracker = CallTracker()
+        _current_tracker.set(tracker)
+    return tracker
+
+# Track the calls made inside the "with" block in a new tracker (the previous tracker is restored after the block)
+@contextmanager
+def tracking_context() -> Iterator[CallTracker]:
+    tracker = CallTracker()
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
 def track_call_count(fn):
+    if not TRACKING_ENABLED: return fn
     def deco(*args, **kwargs):
-        deco.calls += 1
+        counts = (_current_tracker.get() or current_tracker()).counts
+        counts[deco] = counts.get(deco, 0) + 1
         return fn(*args, **kwargs)
-    deco.calls = 0
     return deco
 
+def check_tracking_enabled() -> None:
+    if not TRACKING_ENABLED:
+        raise RuntimeError("The calls are not tracked since the environment variable TRACK_CALLS is set to 0")
+
 def fetch_tracked_call_count(fn):
-    calls = getattr(fn, "calls", 0)
-    setattr(fn, "calls", 0)
-    return calls
+    check_tracking_enabled()
+    return current_tracker().counts.pop(fn, 0)
 
-def record_calls(fn):
+# Record the arguments of the calls (it can be used as @record_calls or @record_calls(capacity=..., every=...))
+# Only the last "capacity" calls are kept and only one every "every" calls is recorded (all the calls are still counted)
+# The calls dropped to respect the capacity are counted, and fetch_recorded_calls warns about them
+def record_calls(fn=None, *, capacity: int = DEFAULT_RECORD_CAPACITY, every: int = 1):
+    if fn is None: return lambda fn: record_calls(fn, capacity=capacity, every=every)
+    if not TRACKING_ENABLED: return fn
     def deco(*args, **kwargs):
-        deco.calls.append({
-            "args": args,
-            "kwargs": kwargs
-        })
+        tracker = _current_tracker.get() or current_tracker()
+        count = tracker.counts.get(deco, 0)
+        tracker.counts[deco] = count + 1
+        if count % every == 0:
+            records = tracker.records.get(deco)
+            if records is None:
+                records = tracker.records[deco] = deque(maxlen=capacity)
+            if len(records) == capacity:
+                tracker.dropped[deco] = tracker.dropped.get(deco, 0) + 1
+            records.append({
+                "args": args,
+                "kwargs": kwargs
+            })
         return fn(*args, **kwargs)
-    deco.calls = deque()
     return deco
 
+# Returns the recorded calls of the function and clears them (along with its call count)
+# If some calls were dropped because the records were full, a RuntimeWarning is issued since the records are incomplete
 def fetch_recorded_calls(fn):
-    calls = getattr(fn, "calls", deque())
-    setattr(fn, "calls", deque())
-    return calls
+    check_tracking_enabled()
+    tracker = current_tracker()
+    tracker.counts.pop(fn, None)
+    dropped = tracker.dropped.pop(fn, 0)
+    if dropped:
+        capacity = tracker.records[fn].maxlen
+        warnings.warn(f"{dropped} calls were dropped from the records since only the last {capacity} calls are kept", RuntimeWarning, stacklevel=2)
+    return tracker.records.pop(fn, deque())
 
 def add_call_listener(listener):
     def decorator(fn):
@@ -100,6 +176,25 @@ def with_cache(cls):
     cls.cache = _cache_function
     return cls
 
+# The problems loaded by the test cases are cached so the same file is only parsed once (see load_problem)
+# The maximum number of cached problems (the least recently used problem is dropped first)
+PROBLEM_CACHE_SIZE = 64
+
+@lru_cache(maxsize=PROBLEM_CACHE_SIZE)
+def _load_problem(loader: Callable, path: str, mtime: int, args: Tuple) -> Any:
+    return loader(path, *args)
+
+# Returns a copy of the problem that "loader" reads from the file (for example, load_problem(SokobanProblem.from_file, path))
+# The problem is only read again if the file is modified (its modification time is part of the key)
+# The copies only share the immutable data (such as the layout of a sokoban level). Problems with data that can be modified
+# (such as the domains of a CSP problem) implement __copy__ to give every copy its own data.
+# Every copy starts with an empty cache (see CacheContainer), so a test case is not sped up by the values cached by the previous test cases
+def load_problem(loader: Callable, path: str, *args) -> Any:
+    path = os.path.abspath(path)
+    problem = copy.copy(_load_problem(loader, path, os.stat(path).st_mtime_ns, args))
+    if hasattr(problem, "__dict__"): problem.__dict__.pop("_cache", None)
+    return problem
+
 class bcolors:
     BLACK = '\033[30m'
     RED = '\033[31m'
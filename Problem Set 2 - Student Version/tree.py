@@ -1,5 +1,6 @@
 from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 from dataclasses import dataclass
+from copy import deepcopy
 from game import Game
 import json
 
@@ -106,6 +107,10 @@ class TreeGame(Game[List, str]):
     def get_successor(self, state: TreeNode, action: str) -> TreeNode:
         return state.children[action]
     
+    # Returns a copy of the game with its own copy of the tree (the nodes can be modified)
+    def __copy__(self) -> 'TreeGame':
+        return TreeGame(deepcopy(self.__root))
+
     # create a tree game from a path to a tree file
     @staticmethod
     def from_file(path: str) -> 'TreeGame':
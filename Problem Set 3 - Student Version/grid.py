@@ -1,8 +1,9 @@
 from typing import Dict, List, Optional, Set, Tuple
 from mdp import MarkovDecisionProcess
 from environment import Environment
-from mathutils import Point, Direction
+from mathutils import Point, Direction, neighbors
 from helpers.mt19937 import RandomGenerator
+from copy import copy
 import json
 
 # The grid markov decision process similar to the one described in the course book
@@ -54,7 +55,7 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
         ]
         states = {}
         for direction, prob in noisy_actions:
-            next_state = state + direction.to_vector()
+            next_state = neighbors(state)[direction]
             if next_state not in self.walkable: next_state = state
             if next_state in states: states[next_state] += prob
             else: states[next_state] = prob
@@ -106,6 +107,11 @@ class GridMDP(MarkovDecisionProcess[Point, Direction]):
     def __str__(self) -> str:
         return f'{self.to_display_str()}\nNoise: {self.noise}'
 
+    # Returns a copy of the MDP with its own positions and rewards since they can be modified (for example, to change the living reward)
+    # The points are immutable so they are shared
+    def __copy__(self) -> 'GridMDP':
+        return GridMDP(self.size, set(self.walkable), set(self.terminals), dict(self.rewards), self.noise)
+
     # Read a Grid MDP from a json file
     @staticmethod
     def from_file(path: str) -> 'GridMDP':
@@ -175,6 +181,10 @@ class GridEnv(Environment[Point, Direction]):
     def render(self):
         print(self.mdp.to_display_str(self.current_state))
 
+    # Returns a new environment with a copy of the MDP (see GridMDP.__copy__) and its own random generator and current state
+    def __copy__(self) -> 'GridEnv':
+        return GridEnv(copy(self.mdp), self.initial_state)
+
     # Creates an environment from a file
     @staticmethod
     def from_file(path: str, inital_state: Optional[Point] = None) -> 'GridEnv':
@@ -1,4 +1,5 @@
 from helpers import test_tools
+from helpers.utils import load_problem
 from grid import GridEnv, GridMDP
 from features_grid import GridFeatureExtractor
 from training_loops import q_agent_training_loop, sarsa_agent_training_loop
@@ -4,7 +4,7 @@ from grid import GridEnv, GridMDP
 from helpers.rl_utils import ACTION_TO_STR, ACTIONS, Policy, QMap, UtilityMap, WeightMap, extract_policy, extract_q_values, extract_utilities, format_grid, format_policy, format_q_values, format_utilities, format_weights
 
 from mathutils import Direction, Point
-from .utils import Result, load_function
+from .utils import Result, load_function, load_problem
 from environment import Environment, S, A
 
 # Checks if two floating point numbers are almost equal
@@ -123,7 +123,7 @@ def compare_utility_policy_results(
         if utilities_match and policy_match and iteration_match:
             return Result(True, 1, "")
 
-    mdp = GridMDP.from_file(level_path)
+    mdp = load_problem(GridMDP.from_file, level_path)
 
     # Since it is not a success, create and return a failure result with a failure message
     nl = '\n'
@@ -182,7 +182,7 @@ def compare_policy_only_results(
     if policy_match:
         return Result(True, 1, "")
 
-    mdp = GridMDP.from_file(level_path)
+    mdp = load_problem(GridMDP.from_file, level_path)
 
     # Since it is not a success, create and return a failure result with a failure message
     nl = '\n'
@@ -231,7 +231,7 @@ def compare_q_policy_results(
     if q_values_match and policy_match:
         return Result(True, 1, "")
 
-    mdp = GridMDP.from_file(level_path)
+    mdp = load_problem(GridMDP.from_file, level_path)
 
     # Since it is not a success, create and return a failure result with a failure message
     nl = '\n'
@@ -282,7 +282,7 @@ def compare_weights_policy_results(
     if weights_match and policy_match:
         return Result(True, 1, "")
 
-    mdp = GridMDP.from_file(level_path)
+    mdp = load_problem(GridMDP.from_file, level_path)
 
     # Since it is not a success, create and return a failure result with a failure message
     nl = '\n'
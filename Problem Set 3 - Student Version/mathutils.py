@@ -1,32 +1,44 @@
 from dataclasses import dataclass
 from enum import IntEnum
-from typing import Iterator
+from typing import Iterator, Tuple
+from functools import lru_cache
 import math
 
 # the class Point will hold a 2D coordinate on a discrete grid
 # We use dataclass with frozen=True to automatically implement:
 #   the constructor, the == operator, the hash function and to make the class immutable
 # Now it can be added to sets and used as keys in dictionaries
+# Since points are immutable, the points computed by the operators are interned (see intern_point)
+# and the hash is computed once when the point is created and stored in the '_hash' slot
+# The '_neighbors' slot is filled on demand by the function neighbors (see below)
+# The hash and the equality are the same as the ones generated by the dataclass
 @dataclass(frozen=True, order=True)
 class Point:
-    __slots__ = ('x', 'y')
+    __slots__ = ('x', 'y', '_hash', '_neighbors')
     x: int
     y: int
 
+    def __post_init__(self) -> None:
+        object.__setattr__(self, '_hash', hash((self.x, self.y)))
+
+    def __hash__(self) -> int:
+        return self._hash
+
     # The following functions implement the operators +, -, negative and str
     def __add__(self, other: 'Point') -> 'Point':
-        return Point(self.x + other.x, self.y + other.y)
+        return intern_point(self.x + other.x, self.y + other.y)
     
     def __sub__(self, other: 'Point') -> 'Point':
-        return Point(self.x - other.x, self.y - other.y)
+        return intern_point(self.x - other.x, self.y - other.y)
     
     def __neg__(self) -> 'Point':
-        return Point(-self.x, -self.y)
+        return intern_point(-self.x, -self.y)
     
     def __str__(self) -> str:
         return f'({self.x}, {self.y})'
     
     def __eq__(self, other: object) -> bool:
+        if self is other: return True
         try:
             x, y = other
             return x==self.x and y==self.y
@@ -43,6 +55,18 @@ class Point:
     def __deepcopy__(self, memo):
         return self
 
+    # Pickle the point through its constructor since a frozen dataclass with slots can not restore its fields by assignment
+    # This is needed to send points between processes
+    def __reduce__(self):
+        return (Point, (self.x, self.y))
+
+# Returns the point with the given coordinates, the same instance is returned for the same coordinates
+# (as long as it stays in the cache) which avoids running the slow constructor of the frozen dataclass
+# The cache is bounded so it does not grow forever when the points are not on a small grid
+@lru_cache(maxsize=2**16)
+def intern_point(x: int, y: int) -> Point:
+    return Point(x, y)
+
 # This is a helper function to compute the manhattan distance between 2 points
 def manhattan_distance(p1: Point, p2: Point) -> int:
     return abs(p1.x - p2.x) + abs(p1.y - p2.y)
@@ -74,4 +98,15 @@ Direction._Vectors = [
     Point(-1,  0),
     Point( 0,  1),
     Point( 0,  0)
-]
\ No newline at end of file
+]
+
+# Returns the neighbors of the point where neighbors(point)[direction] is the point + the vector of the direction
+# The neighbors are computed once per point and stored in its '_neighbors' slot
+# (since the points are interned, every cell of a grid is usually represented by a single point)
+def neighbors(point: Point) -> Tuple[Point, ...]:
+    try:
+        return point._neighbors
+    except AttributeError:
+        result = tuple(point + vector for vector in Direction._Vectors)
+        object.__setattr__(point, '_neighbors', result)
+        return result